@@ -0,0 +1,85 @@
+"""Engine runs in background thread, so window is redrawn and events are handled while it thinks.
+Game loop starts search of position and polls results every frame, search is cancelled by starting another one
+"""
+import queue
+import threading
+from chess.board import Board
+from chess.encoding import decode, encode
+
+INFO, DONE = 0, 1  # kinds of results, info of finished iteration or final result of search
+
+
+class EngineService:
+    def __init__(self, engine, board_class=Board):
+        """
+        engine is Engine or ParallelEngine, it is used only by thread of service, which searches copy of board
+        board_class is rules core of copy, Board or BitboardBoard
+        search_id is number of current search, running search stops when it changes and results of older searches
+        are dropped, moves in results are (start, square, promotion)
+        """
+        self.engine = engine
+        self.board_class = board_class
+        self.search_id = 0
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._serve, name="engine", daemon=True)
+        self.thread.start()
+
+    def start(self, board, color):
+        """Start search of position, search which is running is cancelled
+        :param board:
+        :param color: color on move
+        """
+        self.search_id += 1
+        self.requests.put((self.search_id, encode(board, color)))
+
+    def cancel(self):
+        """Stop running search, its results are never polled
+        """
+        self.search_id += 1
+
+    def poll(self):
+        """Take results of current search, it never waits
+        :return list of (INFO or DONE, info), info of DONE has move None when there is no legal move:
+        """
+        results = []
+        while True:
+            try:
+                search_id, kind, info = self.results.get_nowait()
+            except queue.Empty:
+                return results
+            if search_id == self.search_id:
+                results.append((kind, info))
+
+    def close(self):
+        """Stop search and thread, worker processes of engine are stopped too
+        """
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join()
+        if hasattr(self.engine, "close"):
+            self.engine.close()
+
+    def _serve(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            search_id, data = request
+            if search_id != self.search_id:  # cancelled before it started
+                continue
+            board, color = decode(data, self.board_class)
+            move = self.engine.search(board, color, lambda info: self._report(search_id, INFO, info),
+                                      lambda: self.search_id != search_id)
+            self._report(search_id, DONE, dict(self.engine.info, move=move))
+
+    def _report(self, search_id, kind, info):
+        """Put result to queue, pieces of searched board are replaced by their squares
+        :param search_id:
+        :param kind:
+        :param info:
+        """
+        if info["move"] is not None:
+            piece, square, promotion = info["move"]
+            info = dict(info, move=(piece.square, square, promotion))
+        self.results.put((search_id, kind, info))
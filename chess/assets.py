@@ -0,0 +1,80 @@
+import os
+import pygame
+from chess.constants import SQUARE_SIZE, Color, PieceType
+
+PIECES_DIR = "assets/pieces"
+BOARD_SQUARE_PATH = "assets/black_boardv2.png"
+PIECE_SCALE = 0.67  # piece image takes 67% of square width and full height
+
+
+class Atlas:
+    def __init__(self):
+        """
+        originals are decoded images of pieces, keyed by (Color, PieceType) taken from file name
+        scaled are ready to blit images, keyed by (color, piece_type, size),
+        board square is kept under ("board", "square", size)
+        sizes are square sizes that are in use, every other size is evicted
+        """
+        self.originals = {}
+        self.scaled = {}
+        self.sizes = set()
+
+    def load(self):
+        """Decode every piece image and board square only once,
+        display mode has to be set before, because of convert_alpha
+        """
+        for file_name in os.listdir(PIECES_DIR):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".png":
+                continue
+            color, piece_type = name.upper().split("_")
+            image = pygame.image.load(os.path.join(PIECES_DIR, file_name))
+            self.originals[(Color[color], PieceType[piece_type])] = image.convert_alpha()
+        self.originals[("board", "square")] = pygame.image.load(BOARD_SQUARE_PATH).convert_alpha()
+
+    def _build(self, size):
+        """Scale every original image to given square size
+        :param size:
+        """
+        if not self.originals:
+            self.load()
+        for (color, piece_type), image in self.originals.items():
+            if color == "board":
+                scaled_size = (size, size)
+            else:
+                scaled_size = (size * PIECE_SCALE, size)
+            self.scaled[(color, piece_type, size)] = pygame.transform.scale(image, scaled_size)
+        self.sizes.add(size)
+
+    def resize(self, *sizes):
+        """Keep only given square sizes, builds missing ones and evicts the ones no longer used,
+        it is called when size of window changes
+        :param sizes:
+        """
+        for size in self.sizes - set(sizes):
+            self.scaled = {key: image for key, image in self.scaled.items() if key[2] != size}
+        self.sizes &= set(sizes)
+        for size in sizes:
+            if size not in self.sizes:
+                self._build(size)
+
+    def piece(self, color, piece_type, size=SQUARE_SIZE):
+        """Get scaled image of piece
+        :param color:
+        :param piece_type:
+        :param size:
+        :return:
+        """
+        if size not in self.sizes:
+            self._build(size)
+        return self.scaled[(color, piece_type, size)]
+
+    def square(self, size=SQUARE_SIZE):
+        """Get scaled image of black square
+        :param size:
+        :return:
+        """
+        return self.piece("board", "square", size)
+
+
+atlas = Atlas()  # shared by pieces, board and game
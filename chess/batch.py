@@ -0,0 +1,305 @@
+"""Evaluation of many positions at once with NumPy, for analysis and datasets, numpy isn't needed to play.
+Positions are N x 64 array of Piece.code (0 for empty square), every term is computed for all of them together.
+Run python -m chess.batch to compare speed with evaluation of positions one by one. Batch is about 1.8x faster
+than board_terms, when positions are arrays or encodings already, boards have to be encoded first, which eats the gain
+"""
+import argparse
+import random
+import time
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("batch evaluation needs numpy, install it with pip install numpy") from error
+from chess.board import Board
+from chess.constants import COLS, SQUARES, Color, PieceType, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from chess.encoding import COLOR_BIT, TYPE_MASK, encode
+from chess.engine import evaluate, ENDGAME_MATERIAL, KING_ENDGAME_VALUES, PIECE_VALUES, SQUARE_VALUES
+from chess.fen import load_position
+from chess.tables import BISHOP_DIRECTIONS, ROOK_DIRECTIONS, KNIGHT_TARGETS, RAYS, BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS
+
+CODES = 16  # Piece.code is color << 3 | piece_type
+PLANE_CODES = np.array([color << COLOR_BIT | piece_type for color in Color for piece_type in PieceType], np.int8)
+MOBILITY_WEIGHTS = {KNIGHT: 4, BISHOP: 5, ROOK: 2, QUEEN: 1}  # per reachable square
+SHIELD_BONUS = 10  # per own pawn in front of king
+ZONE_PENALTY = 8  # per enemy piece near king, pawns aren't counted
+OFF_BOARD = SQUARES  # padding column, it is always occupied
+
+
+def _code_table(values):
+    """Table [code][square] of white minus black values
+    :param values: function of color, piece type and square
+    :return:
+    """
+    table = np.zeros((CODES, SQUARES), np.int32)
+    for color in Color:
+        sign = 1 if color == Color.WHITE else -1
+        for piece_type in PieceType:
+            table[color << COLOR_BIT | piece_type] = [sign * values(color, piece_type, square)
+                                                      for square in range(SQUARES)]
+    return table
+
+
+SQUARE_TABLE = _code_table(lambda color, piece_type, square: SQUARE_VALUES[color][piece_type][square])
+KING_ENDGAME_TABLE = _code_table(lambda color, piece_type, square: piece_type == KING and
+                                 KING_ENDGAME_VALUES[color][square] - SQUARE_VALUES[color][KING][square])
+MOBILITY_TABLE = np.array([MOBILITY_WEIGHTS.get(piece_type, 0) for piece_type in range(TYPE_MASK + 1)], np.int32)
+MATERIAL = np.array([PIECE_VALUES[code & TYPE_MASK] if code & TYPE_MASK not in (0, 7, PAWN) else 0
+                     for code in range(CODES)], np.int32)  # pieces counted for endgame, pawns and kings aren't
+SQUARE_INDEX = np.arange(SQUARES)
+
+
+def _targets(table):
+    """Step table padded to 8 targets per square with OFF_BOARD
+    :param table:
+    :return:
+    """
+    return np.array([list(targets) + [OFF_BOARD] * (8 - len(targets)) for targets in table], np.intp)
+
+
+KNIGHT_STEPS = _targets(KNIGHT_TARGETS)
+DIRECTIONS = BISHOP_DIRECTIONS + ROOK_DIRECTIONS
+RAY_TARGETS = np.array([[list(RAYS[direction][square]) + [OFF_BOARD] * (COLS - 1 - len(RAYS[direction][square]))
+                         for direction in DIRECTIONS] for square in range(SQUARES)], np.intp)  # [square][direction]
+SLIDER_DIRECTIONS = np.array([[piece_type in (BISHOP, QUEEN) and direction in BISHOP_DIRECTIONS or
+                               piece_type in (ROOK, QUEEN) and direction in ROOK_DIRECTIONS for direction in DIRECTIONS]
+                              for piece_type in range(TYPE_MASK + 1)])
+ZONE = np.array([[max(abs(square // COLS - king // COLS), abs(square % COLS - king % COLS)) <= 2
+                  for square in range(SQUARES)] for king in range(SQUARES)])
+SHIELD = np.array([[[square // COLS == king // COLS + (-1 if color == Color.WHITE else 1) and
+                     abs(square % COLS - king % COLS) <= 1 for square in range(SQUARES)]
+                    for king in range(SQUARES)] for color in Color])
+SLIDER_RAYS = {BISHOP: BISHOP_RAYS, ROOK: ROOK_RAYS, QUEEN: QUEEN_RAYS}  # tables of board_terms
+ZONE_SQUARES = [tuple(np.flatnonzero(zone).tolist()) for zone in ZONE]
+SHIELD_SQUARES = [[tuple(np.flatnonzero(shield).tolist()) for shield in table] for table in SHIELD]
+
+
+def encode_boards(boards):
+    """Codes of pieces on boards
+    :param boards:
+    :return N x 64 int8 array:
+    """
+    return np.array([[0 if piece == 0 else piece.code for piece in board.board] for board in boards], np.int8)
+
+
+def from_encodings(encodings):
+    """Codes and colors of positions encoded by chess.encoding, without creating boards
+    :param encodings: list of bytes
+    :return N x 64 int8 array, N colors:
+    """
+    data = np.frombuffer(b"".join(encoding[:SQUARES + 1] for encoding in encodings), np.int8).reshape(-1, SQUARES + 1)
+    return data[:, :SQUARES] & (TYPE_MASK | 1 << COLOR_BIT), data[:, SQUARES].copy()
+
+
+def planes(codes):
+    """One plane of every piece type of every color
+    :param codes: N x 64 array
+    :return N x 12 x 64 bool array, white pawn, knight, ..., king, black pawn, ...:
+    """
+    return codes[:, None, :] == PLANE_CODES[None, :, None]
+
+
+def _mobility(types, own, empty):
+    """Weighted number of squares reachable by pieces of one color, squares of own pieces aren't counted,
+    only squares with knights and sliders are gathered
+    :param types: N x 64 piece types of the color, 0 for other squares
+    :param own: N x 65, pieces of the color, padding column is True
+    :param empty: N x 65, padding column is False
+    :return N scores:
+    """
+    own, empty = own.ravel(), empty.ravel()  # gathers from flat arrays are faster
+    rows, squares = np.nonzero(types == KNIGHT)
+    reach = (~own[(rows * (SQUARES + 1))[:, None] + KNIGHT_STEPS[squares]]).sum(1)
+    score = np.bincount(rows, reach * MOBILITY_WEIGHTS[KNIGHT], len(types))
+
+    rows, squares = np.nonzero(np.isin(types, (BISHOP, ROOK, QUEEN)))
+    targets = (rows * (SQUARES + 1))[:, None, None] + RAY_TARGETS[squares]  # M x 8 directions x 7 distances
+    open_ray = np.ones(targets.shape, bool)  # squares before target are empty
+    np.logical_and.accumulate(empty[targets[:, :, :-1]], 2, out=open_ray[:, :, 1:])
+    reach = (open_ray & ~own[targets]).sum(2)  # enemy piece on the end can be captured
+    piece_types = types[rows, squares]
+    reach = (reach * SLIDER_DIRECTIONS[piece_types]).sum(1)
+    score += np.bincount(rows, reach * MOBILITY_TABLE[piece_types], len(types))
+    return score.astype(np.int32)
+
+
+def _king_safety(codes, color, own_pawns, enemies):
+    """Pawns in front of king and enemy pieces near it
+    :param codes: N x 64
+    :param color:
+    :param own_pawns: N x 64
+    :param enemies: N x 64, enemy pieces without pawns and king
+    :return N scores:
+    """
+    kings = codes == (color << COLOR_BIT | KING)
+    king = kings.argmax(1)
+    shield = (own_pawns & SHIELD[color][king]).sum(1)
+    attackers = (enemies & ZONE[king]).sum(1)
+    return np.where(kings.any(1), SHIELD_BONUS * shield - ZONE_PENALTY * attackers, 0)
+
+
+def evaluate_terms(codes):
+    """Terms of evaluation for white, every term is computed for all positions together
+    :param codes: N x 64 array of Piece.code
+    :return dict of name: N array, material includes piece-square tables like engine.evaluate:
+    """
+    codes = np.asarray(codes, np.int8)
+    padded = np.hstack([codes, np.zeros((len(codes), 1), np.int8)])
+    types = codes & TYPE_MASK
+    colors = codes >> COLOR_BIT
+    empty = padded == 0
+    empty[:, OFF_BOARD] = False
+    endgame = MATERIAL[codes].sum(1) < ENDGAME_MATERIAL
+    material = SQUARE_TABLE[codes, SQUARE_INDEX].sum(1)
+    material += np.where(endgame, KING_ENDGAME_TABLE[codes, SQUARE_INDEX].sum(1), 0)
+
+    mobility = np.zeros(len(codes), np.int32)
+    safety = np.zeros(len(codes), np.int32)
+    for color, sign in ((Color.WHITE, 1), (Color.BLACK, -1)):
+        pieces = (types != 0) & (colors == color)
+        own = np.hstack([pieces, np.ones((len(codes), 1), bool)])
+        color_types = np.where(pieces, types, 0)
+        mobility += sign * _mobility(color_types, own, empty)
+        enemies = (types != 0) & (colors != color) & (types != PAWN) & (types != KING)
+        safety += sign * _king_safety(codes, color, color_types == PAWN, enemies)
+    return {"material": material, "mobility": mobility, "king_safety": np.where(endgame, 0, safety)}
+
+
+def evaluate_batch(codes, colors):
+    """Scores of positions, positive is better for color on move like engine.evaluate
+    :param codes: N x 64 array of Piece.code
+    :param colors: N colors on move
+    :return N int array:
+    """
+    score = sum(evaluate_terms(codes).values())
+    return np.where(np.asarray(colors) == Color.WHITE, score, -score)
+
+
+def board_terms(board):
+    """Same terms as evaluate_terms for one board, computed piece by piece like engine.evaluate,
+    to check batch evaluation and compare its speed
+    :param board:
+    :return dict of name: score for white:
+    """
+    squares = board.board
+    mobility = 0
+    material = 0
+    kings = {}
+    for piece in board.pieces():
+        piece_type, color, square = piece.piece_type, piece.color, piece.square
+        if piece_type == KING:
+            kings[color] = square
+            continue
+        if piece_type == PAWN:
+            continue
+        material += PIECE_VALUES[piece_type]
+        reach = 0
+        if piece_type == KNIGHT:
+            for target in KNIGHT_TARGETS[square]:
+                other = squares[target]
+                if other == 0 or other.color != color:
+                    reach += 1
+        else:
+            for ray in SLIDER_RAYS[piece_type][square]:
+                for target in ray:
+                    other = squares[target]
+                    if other == 0:
+                        reach += 1
+                        continue
+                    if other.color != color:  # enemy piece on the end can be captured
+                        reach += 1
+                    break
+        reach *= MOBILITY_WEIGHTS[piece_type]
+        mobility += reach if color == Color.WHITE else -reach
+    safety = 0
+    if material >= ENDGAME_MATERIAL:
+        for color, king in kings.items():
+            score = 0
+            for square in SHIELD_SQUARES[color][king]:
+                other = squares[square]
+                if other != 0 and other.color == color and other.piece_type == PAWN:
+                    score += SHIELD_BONUS
+            for square in ZONE_SQUARES[king]:
+                other = squares[square]
+                if other != 0 and other.color != color and other.piece_type not in (PAWN, KING):
+                    score -= ZONE_PENALTY
+            safety += score if color == Color.WHITE else -score
+    return {"material": evaluate(board, Color.WHITE), "mobility": mobility, "king_safety": safety}
+
+
+def random_positions(count, seed=0, max_plies=60):
+    """Positions of random games, for benchmark
+    :param count:
+    :param seed:
+    :param max_plies:
+    :return list of (board, color):
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, color = Board(), Color.WHITE
+        for _ in range(rng.randrange(max_plies)):
+            moves = board.generate_legal_moves(color)
+            if not moves:
+                break
+            moves.sort(key=lambda move: (move[0].square, move[1], move[2]))  # order of generated moves isn't fixed
+            board.move(*rng.choice(moves))
+            color ^= 1
+        positions.append((board, Color(color)))
+    return positions
+
+
+def benchmark(positions):
+    """Compare speed of engine.evaluate, board_terms and batch evaluation of the same positions,
+    board_terms computes the same terms as batch, engine.evaluate only material and piece-square tables
+    :param positions: list of (board, color)
+    """
+    count = len(positions)
+    start = time.perf_counter()
+    scores = [evaluate(board, color) for board, color in positions]
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = [board_terms(board) for board, _ in positions]
+    pieces = time.perf_counter() - start
+
+    start = time.perf_counter()
+    codes = encode_boards(board for board, _ in positions)
+    colors = np.array([color for _, color in positions], np.int8)
+    encoding = time.perf_counter() - start
+    start = time.perf_counter()
+    terms = evaluate_terms(codes)
+    batch = time.perf_counter() - start
+
+    encodings = [encode(board, color) for board, color in positions]  # like positions of dataset
+    start = time.perf_counter()
+    evaluate_terms(from_encodings(encodings)[0])
+    stored = time.perf_counter() - start
+
+    material = np.where(colors == Color.WHITE, terms["material"], -terms["material"])
+    same = np.array_equal(material, scores)
+    print(f"{count} positions, material and piece-square terms {'equal' if same else 'DIFFER'} to engine.evaluate")
+    same = all(np.array_equal(terms[name], [board[name] for board in reference]) for name in terms)
+    print(f"mobility and king safety terms {'equal' if same else 'DIFFER'} to board_terms")
+    print(f"engine.evaluate      {count / single:>12.0f} positions/s  material and piece-square terms only")
+    print(f"board_terms          {count / pieces:>12.0f} positions/s  every term, piece by piece")
+    print(f"encode_boards        {count / encoding:>12.0f} positions/s")
+    print(f"evaluate_terms       {count / batch:>12.0f} positions/s  {pieces / batch:.1f}x faster than board_terms")
+    print(f"encode and evaluate  {count / (encoding + batch):>12.0f} positions/s  "
+          f"{pieces / (encoding + batch):.1f}x faster than board_terms")
+    print(f"from encodings       {count / stored:>12.0f} positions/s  {pieces / stored:.1f}x faster than board_terms")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.batch", description=__doc__)
+    parser.add_argument("--positions", type=int, default=10000, help="number of random positions")
+    parser.add_argument("--fens", help="file with FEN of position on every line, used instead of random positions")
+    args = parser.parse_args()
+    if args.fens:
+        with open(args.fens) as file:
+            benchmark([load_position(line) for line in file if line.strip()])
+    else:
+        benchmark(random_positions(args.positions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,492 @@
+from chess.board import Board
+from chess.constants import COLS, SQUARES, Color, PieceType, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PROMOTION_TYPES
+from chess.tables import KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS as PAWN_TARGETS, RAYS as RAY_SQUARES, \
+    BISHOP_DIRECTIONS, ROOK_DIRECTIONS
+
+COLORS = tuple(Color)
+PIECE_TYPES = tuple(PieceType)
+PAWN_STEP = (-COLS, COLS)  # indexed by color, white pawns go to row 0, black to row 7
+FULL = (1 << SQUARES) - 1
+FILE_A = sum(1 << square for square in range(0, SQUARES, COLS))  # column 0
+FILE_H = FILE_A << (COLS - 1)
+LAST_ROWS = ((1 << COLS) - 1, ((1 << COLS) - 1) << (SQUARES - COLS))  # promotion squares indexed by color
+
+
+def squares(bitboard):
+    """Iterate over set bits of bitboard, bit 0 is (0, 0), bit 63 is (7, 7)
+    :param bitboard:
+    """
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+def _masks(table):
+    """Turn table of squares from tables into list of bitboards indexed by square
+    :param table:
+    :return:
+    """
+    return [sum(1 << target for target in targets) for targets in table]
+
+
+KNIGHT_ATTACKS = _masks(KNIGHT_TARGETS)
+KING_ATTACKS = _masks(KING_TARGETS)
+PAWN_ATTACKS = tuple(_masks(table) for table in PAWN_TARGETS)  # indexed by color
+RAYS = {direction: _masks(table) for direction, table in RAY_SQUARES.items()}
+RAY_INCREASES = {direction: direction[0] * COLS + direction[1] > 0 for direction in RAYS}  # first blocker is lowest bit
+BETWEEN = [[0] * SQUARES for _ in range(SQUARES)]  # squares strictly between two aligned squares
+for _square in range(SQUARES):
+    for _direction in RAYS:
+        _between = 0
+        for _target in RAY_SQUARES[_direction][_square]:
+            BETWEEN[_square][_target] = _between
+            _between |= 1 << _target
+
+
+BISHOP_SLIDES = tuple(tuple((RAYS[direction][square], RAY_INCREASES[direction], RAYS[direction])
+                            for direction in BISHOP_DIRECTIONS if RAYS[direction][square]) for square in range(SQUARES))
+ROOK_SLIDES = tuple(tuple((RAYS[direction][square], RAY_INCREASES[direction], RAYS[direction])
+                          for direction in ROOK_DIRECTIONS if RAYS[direction][square]) for square in range(SQUARES))
+
+
+def _slider_attacks(slides, occupied):
+    """Attacks of bishop or rook, ray stops on first occupied square (included)
+    :param slides: (ray, increases, rays of direction) of every direction from square
+    :param occupied:
+    :return:
+    """
+    attacks = 0
+    for ray, increases, rays in slides:
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1 if increases else blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(square, occupied):
+    return _slider_attacks(BISHOP_SLIDES[square], occupied)
+
+
+def rook_attacks(square, occupied):
+    return _slider_attacks(ROOK_SLIDES[square], occupied)
+
+
+def pawn_attacks(pawns, color):
+    """Squares attacked by every pawn of bitboard at once, pawns on edge columns attack only one way
+    :param pawns:
+    :param color:
+    :return:
+    """
+    if color == Color.WHITE:
+        return (pawns & ~FILE_A) >> (COLS + 1) | (pawns & ~FILE_H) >> (COLS - 1)
+    return ((pawns & ~FILE_A) << (COLS - 1) | (pawns & ~FILE_H) << (COLS + 1)) & FULL
+
+
+class BitboardPosition:
+    def __init__(self):
+        """
+        pieces have one 64 bit integer for every color and piece type, bit is set where piece stands,
+        they are indexed [color][piece_type], index 0 of piece type is unused
+        occupied is bitboard of all pieces of color
+        unmoved are pieces with 0 moves, used for pawn double step and castle, like Piece.moves in Board
+        """
+        self.pieces = [[0] * (len(PIECE_TYPES) + 1) for _ in COLORS]
+        self.occupied = [0] * len(COLORS)
+        self.unmoved = 0
+
+    @classmethod
+    def from_board(cls, board):
+        """Create position from list of squares used by Board
+        :param board:
+        :return:
+        """
+        position = cls()
+        for square, piece in enumerate(board):
+            if piece != 0:
+                position.put(square, piece.color, piece.piece_type, piece.moves == 0)
+        return position
+
+    def put(self, square, color, piece_type, unmoved=False):
+        bit = 1 << square
+        self.pieces[color][piece_type] |= bit
+        self.occupied[color] |= bit
+        if unmoved:
+            self.unmoved |= bit
+
+    def lift(self, square, color, piece_type):
+        """Remove piece, which is known to stand on square
+        :param square:
+        :param color:
+        :param piece_type:
+        """
+        bit = 1 << square
+        self.pieces[color][piece_type] ^= bit
+        self.occupied[color] ^= bit
+        self.unmoved &= ~bit
+
+    def piece_at(self, square):
+        """Get (color, piece_type) of piece on square, None if it is empty
+        :param square:
+        :return:
+        """
+        bit = 1 << square
+        for color in COLORS:
+            if self.occupied[color] & bit:
+                for piece_type in PIECE_TYPES:
+                    if self.pieces[color][piece_type] & bit:
+                        return color, piece_type
+        return None
+
+    def attacked(self, color, occupied=None):
+        """Bitboard of squares attacked by color
+        :param color:
+        :param occupied: occupancy used for sliding pieces, by default all pieces
+        :return:
+        """
+        if occupied is None:
+            occupied = self.occupied[0] | self.occupied[1]
+        pieces = self.pieces[color]
+        attacks = pawn_attacks(pieces[PAWN], color)
+        for square in squares(pieces[KNIGHT] | pieces[KING]):
+            attacks |= KNIGHT_ATTACKS[square] if pieces[KNIGHT] >> square & 1 else KING_ATTACKS[square]
+        for square in squares(pieces[BISHOP] | pieces[QUEEN]):
+            attacks |= _slider_attacks(BISHOP_SLIDES[square], occupied)
+        for square in squares(pieces[ROOK] | pieces[QUEEN]):
+            attacks |= _slider_attacks(ROOK_SLIDES[square], occupied)
+        return attacks
+
+    def attackers(self, square, color, occupied=None):
+        """Bitboard of pieces of color, which attack square
+        :param square:
+        :param color:
+        :param occupied:
+        :return:
+        """
+        if occupied is None:
+            occupied = self.occupied[0] | self.occupied[1]
+        pieces = self.pieces[color]
+        diagonal = _slider_attacks(BISHOP_SLIDES[square], occupied) & (pieces[BISHOP] | pieces[QUEEN])
+        straight = _slider_attacks(ROOK_SLIDES[square], occupied) & (pieces[ROOK] | pieces[QUEEN])
+        return (diagonal | straight | KNIGHT_ATTACKS[square] & pieces[KNIGHT] |
+                PAWN_ATTACKS[color ^ 1][square] & pieces[PAWN] | KING_ATTACKS[square] & pieces[KING])
+
+    def king_square(self, color):
+        king = self.pieces[color][KING]
+        return king.bit_length() - 1 if king else None
+
+    def checkers(self, color):
+        """Bitboard of enemy pieces giving check to king of color
+        :param color:
+        :return:
+        """
+        king = self.king_square(color)
+        if king is None:
+            return 0
+        return self.attackers(king, color ^ 1)
+
+    def pins(self, color):
+        """Pinned pieces of color, with squares they still can go to
+        :param color:
+        :return dict of square: bitboard of ray between king and pinning piece (pinning piece included):
+        """
+        king = self.king_square(color)
+        if king is None:
+            return {}
+        enemy = self.pieces[color ^ 1]
+        enemy_occupied = self.occupied[color ^ 1]
+        occupied = enemy_occupied | self.occupied[color]
+        snipers = (_slider_attacks(BISHOP_SLIDES[king], enemy_occupied) & (enemy[BISHOP] | enemy[QUEEN]) |
+                   _slider_attacks(ROOK_SLIDES[king], enemy_occupied) & (enemy[ROOK] | enemy[QUEEN]))
+        pins = {}
+        for sniper in squares(snipers):
+            between = BETWEEN[king][sniper] & occupied
+            if between and between & (between - 1) == 0 and between & self.occupied[color]:
+                pins[between.bit_length() - 1] = BETWEEN[king][sniper] | 1 << sniper
+        return pins
+
+    def castle(self, color):
+        """Check if long and short castle is allowed, king and rook didn't move,
+        squares between are empty and king doesn't go through or to attacked square
+        :param color:
+        :return long_castle, short_castle:
+        """
+        king = self.king_square(color)
+        if king is None or not self.unmoved & 1 << king or king % COLS != 4:
+            return False, False
+        attacked = self.attacked(color ^ 1)
+        if attacked & 1 << king:
+            return False, False
+        return self._castle(color, king, self.occupied[0] | self.occupied[1], attacked)
+
+    def _castle(self, color, king, occupied, attacked):
+        """Castles of unmoved king, which isn't in check
+        :param color:
+        :param king: square of king
+        :param occupied:
+        :param attacked: squares attacked by enemy
+        :return long_castle, short_castle:
+        """
+        rooks = self.pieces[color][ROOK] & self.unmoved
+        long_castle = bool(rooks & 1 << (king - 4) and not occupied & BETWEEN[king][king - 4] and
+                           not attacked & (1 << (king - 1) | 1 << (king - 2)))
+        short_castle = bool(rooks & 1 << (king + 3) and not occupied & BETWEEN[king][king + 3] and
+                            not attacked & (1 << (king + 1) | 1 << (king + 2)))
+        return long_castle, short_castle
+
+    def pseudo_targets(self, square):
+        """Squares piece can go to without looking at own king, and own pieces it defends
+        :param square:
+        :return moves, defended:
+        """
+        color, piece_type = self.piece_at(square)
+        occupied = self.occupied[0] | self.occupied[1]
+        if piece_type == PAWN:
+            attacks = PAWN_ATTACKS[color][square]
+        elif piece_type == KNIGHT:
+            attacks = KNIGHT_ATTACKS[square]
+        elif piece_type == KING:
+            attacks = KING_ATTACKS[square]
+        else:
+            attacks = 0
+            if piece_type != ROOK:
+                attacks |= _slider_attacks(BISHOP_SLIDES[square], occupied)
+            if piece_type != BISHOP:
+                attacks |= _slider_attacks(ROOK_SLIDES[square], occupied)
+        defended = attacks & self.occupied[color]
+        if piece_type != PAWN:
+            return attacks & ~self.occupied[color], defended
+        return attacks & self.occupied[color ^ 1] | self._pawn_pushes(square, color, ~occupied), defended
+
+    def _pawn_pushes(self, square, color, empty):
+        """Squares in front of pawn, it goes 2 squares only on its first move
+        :param square:
+        :param color:
+        :param empty: bitboard of empty squares
+        :return:
+        """
+        step = PAWN_STEP[color]
+        push = square + step
+        if not 0 <= push < SQUARES or not empty >> push & 1:  # pawn waiting for promotion stands on last row
+            return 0
+        if self.unmoved >> square & 1 and 0 <= push + step < SQUARES and empty >> (push + step) & 1:
+            return 1 << push | 1 << (push + step)
+        return 1 << push
+
+    def legal_targets(self, color):
+        """Legal moves of every piece of color, checkers, pins and squares attacked by enemy are found once
+        for whole position, king can't go to attacked squares, pinned pieces stay on pin ray
+        and when king is in check pieces can only block or capture checking piece
+        :param color:
+        :return dict of square of piece: bitboard of squares it can go to, pieces without moves are left out:
+        """
+        pieces = self.pieces[color]
+        own = self.occupied[color]
+        enemy = self.occupied[color ^ 1]
+        occupied = own | enemy
+        targets = {}
+        check_mask = FULL
+        pins = {}
+        king = self.king_square(color)
+        if king is not None:
+            attacked = self.attacked(color ^ 1, occupied ^ 1 << king)  # king can't hide behind itself
+            moves = KING_ATTACKS[king] & ~own & ~attacked
+            checkers = self.attackers(king, color ^ 1, occupied)
+            if not checkers and self.unmoved >> king & 1 and king % COLS == 4:
+                long_castle, short_castle = self._castle(color, king, occupied, attacked)
+                if long_castle:
+                    moves |= 1 << (king - 2)
+                if short_castle:
+                    moves |= 1 << (king + 2)
+            if moves:
+                targets[king] = moves
+            if checkers & (checkers - 1):  # double check, only king can move
+                return targets
+            if checkers:
+                check_mask = BETWEEN[king][checkers.bit_length() - 1] | checkers
+            pins = self.pins(color)
+
+        empty = ~occupied
+        not_own = ~own & check_mask
+        for square in squares(pieces[PAWN]):
+            moves = (PAWN_ATTACKS[color][square] & enemy | self._pawn_pushes(square, color, empty)) & check_mask
+            if square in pins:
+                moves &= pins[square]
+            if moves:
+                targets[square] = moves
+        for square in squares(pieces[KNIGHT]):
+            moves = KNIGHT_ATTACKS[square] & not_own
+            if moves and square not in pins:  # pinned knight can't stay on ray
+                targets[square] = moves
+        for square in squares(pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN]):
+            moves = 0
+            if not pieces[ROOK] >> square & 1:
+                moves |= _slider_attacks(BISHOP_SLIDES[square], occupied)
+            if not pieces[BISHOP] >> square & 1:
+                moves |= _slider_attacks(ROOK_SLIDES[square], occupied)
+            moves &= not_own
+            if square in pins:
+                moves &= pins[square]
+            if moves:
+                targets[square] = moves
+        return targets
+
+    def legal_moves(self, color):
+        """Generate every legal move of color
+        :param color:
+        :return list of (start, end) squares:
+        """
+        return [(start, end) for start, targets in self.legal_targets(color).items() for end in squares(targets)]
+
+
+class BitboardBoard(Board):
+    def __init__(self):
+        """
+        board with the same interface as Board, but moves are generated from BitboardPosition,
+        which make_move and unmake_move change by few xors, status of list board (piece_status, attacks, watchers)
+        isn't kept at all, board list is still kept up to date, because of Game, FEN and drawing
+        targets_cache is result of legal_targets for every color, it is cleared after every change like move_cache
+        """
+        self.targets_cache = {}
+        super().__init__()
+
+    def create_board(self):
+        super().create_board()
+        self.position = BitboardPosition.from_board(self.board)
+
+    def set_pieces(self, pieces, color=Color.WHITE, history=()):
+        super().set_pieces(pieces, color, history)
+        self.position = BitboardPosition.from_board(self.board)
+
+    def update_status(self, squares):
+        """Nothing is regenerated after change, moves are generated from bitboards, when they are needed
+        :param squares:
+        """
+        self.move_cache = {}
+        self.targets_cache = {}
+
+    def make_move(self, piece, square, promotion=None):
+        position = self.position
+        start = piece.square
+        captured = self.board[square]
+        if captured != 0:
+            position.lift(square, captured.color, captured.piece_type)
+        position.lift(start, piece.color, piece.piece_type)
+        position.put(square, piece.color, promotion or piece.piece_type)
+        if piece.piece_type == KING and abs(start - square) == 2:  # castle
+            rook_square, rook_end_square = (start - 4, start - 1) if square < start else (start + 3, start + 1)
+            position.lift(rook_square, piece.color, ROOK)
+            position.put(rook_end_square, piece.color, ROOK)
+        return super().make_move(piece, square, promotion)
+
+    def unmake_move(self):
+        """Take back last move on bitboards and board
+        :return undo record:
+        """
+        piece, start, moves, captured, castle_rook, piece_type = self.undo_stack[-1]
+        end = piece.square
+        position = self.position
+        position.lift(end, piece.color, piece.piece_type)
+        position.put(start, piece.color, piece_type, moves == 0)
+        if captured != 0:
+            position.put(end, captured.color, captured.piece_type, captured.moves == 0)
+        if castle_rook:
+            rook, rook_square, rook_end_square = castle_rook
+            position.lift(rook_end_square, rook.color, ROOK)
+            position.put(rook_square, rook.color, ROOK, rook.moves == 1)
+        return super().unmake_move()
+
+    def remove(self, square):
+        piece = self.board[square]
+        self.position.lift(square, piece.color, piece.piece_type)
+        super().remove(square)
+
+    def promote(self, piece, piece_type):
+        self.position.lift(piece.square, piece.color, piece.piece_type)
+        self.position.put(piece.square, piece.color, piece_type)
+        super().promote(piece, piece_type)
+
+    def pieces(self):
+        return [piece for piece in self.board if piece != 0]
+
+    def legal_targets(self, color):
+        """Bitboards of legal moves of color, computed once per position
+        :param color:
+        :return:
+        """
+        if color not in self.targets_cache:
+            self.targets_cache[color] = self.position.legal_targets(color)
+        return self.targets_cache[color]
+
+    def _targets_to_moves(self, targets):
+        return {square: self.board[square] for square in squares(targets)}
+
+    def legal_move_map(self, color):
+        if color not in self.move_cache:
+            self.move_cache[color] = {start: self._targets_to_moves(targets)
+                                      for start, targets in self.legal_targets(color).items()}
+        return self.move_cache[color]
+
+    def legal_moves(self, piece):
+        return self.legal_move_map(piece.color).get(piece.square, {})
+
+    def generate_legal_moves(self, color, captures_only=False):
+        """Every legal move of color straight from bitboards, like Board.generate_legal_moves
+        :param color:
+        :param captures_only:
+        :return:
+        """
+        board = self.board
+        enemy = self.position.occupied[color ^ 1]
+        last_row = LAST_ROWS[color]
+        moves = []
+        for start, targets in self.legal_targets(color).items():
+            piece = board[start]
+            if piece.piece_type == PAWN and targets & last_row:
+                moves += [(piece, square, piece_type) for square in squares(targets & last_row)
+                          for piece_type in PROMOTION_TYPES]
+                targets &= ~last_row
+            if captures_only:
+                targets &= enemy
+            moves += [(piece, square, None) for square in squares(targets)]
+        return moves
+
+    def in_check(self, color):
+        return bool(self.position.checkers(color))
+
+    def attackers(self, square, color):
+        return [self.board[attacker] for attacker in squares(self.position.attackers(square, color))]
+
+    def get_valid_moves(self, piece):
+        """Legal moves of piece, pins and check are already included, and pieces it defends
+        :param piece:
+        :return:
+        """
+        _, defended = self.position.pseudo_targets(piece.square)
+        return {
+            "moves": self.legal_moves(piece),
+            "defended_pieces": self._targets_to_moves(defended),
+        }
+
+    def get_status(self, color):
+        """Generate status of game, with the same keys as Board.get_status
+        :param color:
+        :return:
+        """
+        status = self.empty_status(color)
+        for piece_color in COLORS:
+            for square in squares(self.position.occupied[piece_color]):
+                moves, defended = self.position.pseudo_targets(square)
+                piece_moves = self._targets_to_moves(moves)
+                status["pieces"][piece_color][square] = piece_moves
+                status["moves"][piece_color].extend(piece_moves)
+                status["pieces_defended"][piece_color].extend(self._targets_to_moves(defended).values())
+            checkers = self.position.checkers(piece_color)
+            if checkers:
+                status["check"]["king_piece"] = self.board[self.position.king_square(piece_color)]
+                status["check"]["checking_pieces"] = [self.board[square] for square in squares(checkers)]
+        return status
+
+    def castle(self, color, square):
+        return self.position.castle(color)
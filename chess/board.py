@@ -1,582 +1,659 @@
-import pygame
-import copy
-from chess.constants import BLACK, WHITE, ROWS, COLS, SQUARE_SIZE
+from chess.constants import COLS, SQUARES, Color, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PROMOTION_TYPES
 from chess.piece import Piece
+from chess.tables import KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, PAWN_PUSHES, BISHOP_RAYS, ROOK_RAYS, \
+    QUEEN_RAYS, RAYS
+from chess.zobrist import PIECE_KEYS, TURN_KEY, castling_key, compute_hash
+
+CHECKMATE, STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVES, REPETITION = \
+    "checkmate", "stalemate", "insufficient material", "fifty-move rule", "threefold repetition"  # ends of game
+FIFTY_MOVE_PLIES = 100  # plies without capture or pawn move, after which game is drawn
 
 
 class Board:
     def __init__(self):
         """
-        board is representing every row and column, pieces are there
-        pawn_promotion bool goes true if pawn black pawn is on 7 row or white on 0
+        board is list of 64 squares, pieces are there, empty square is 0
         status have all information about game, updates after every move
+        hash is zobrist key of position, hash_history are keys before every move on undo_stack
+        start_clock and start_ply are halfmove clock and number of plies before first move on undo_stack
         """
         self.board = []
         self.col_start_pos = {  # starting position of pieces on first and last row
-            0: "rook",
-            1: "knight",
-            2: "bishop",
-            3: "queen",
-            4: "king",
-            5: "bishop",
-            6: "knight",
-            7: "rook"
-        }
-        self.pawn_promotion = False
-        self.status = {
-            "on_move": 0,
-            "white_pieces": {},
-            "white_moves": [],
-            "white_pieces_defended": [],
-            "black_pieces": {},
-            "black_moves": [],
-            "black_pieces_defended": [],
-            "check": {
-                "king_piece": 0,
-                "checking_pieces": [],
-            },
-
+            0: ROOK,
+            1: KNIGHT,
+            2: BISHOP,
+            3: QUEEN,
+            4: KING,
+            5: BISHOP,
+            6: KNIGHT,
+            7: ROOK
         }
+        self.status = self.empty_status(0)
+        self.undo_stack = []  # records of make_move, newest last
+        self.piece_status = {}  # piece: (moves, defended_pieces, attacked squares, watched squares)
+        self.attacks = [[0] * SQUARES for _ in Color]  # attackers count, indexed by color and square
+        self.watchers = [set() for _ in range(SQUARES)]  # pieces, whose moves depend on square
+        self.king_pieces = {}  # king of every color, which is on board
+        self.pin_cache = {}  # result of pins_and_checks for every color, cleared after every change
+        self.move_cache = {}  # result of legal_move_map for every color, cleared after every change
         self.create_board()
+        self.update_status(range(SQUARES))
+        self.hash = compute_hash(self.board, Color.WHITE)
+        self.hash_history = []
+        self.start_clock = 0
+        self.start_ply = 0
         self.check_bool = False
         self.checkmate_bool = False
+        self.draw_bool = False
+        self.draw_reason = None  # STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVES or REPETITION
 
     @staticmethod
-    def draw_squares(win):
-        """ Draw squares of board, firstly white color generates on screen,
-        then makes every 2 square black squares from image
-        :param win:
+    def empty_status(color):
+        """Status without any piece, pieces, moves and pieces_defended are indexed by color,
+        pieces are {square: moves of piece standing there}
+        :param color: color on move
         :return:
         """
-        win.fill(WHITE)
-        black_square = pygame.image.load('assets/black_boardv2.png')
-        black_square = pygame.transform.scale(black_square, (SQUARE_SIZE, SQUARE_SIZE))
-        for row in range(ROWS):
-            for col in range(row % 2 - 1, ROWS, 2):
-                win.blit(black_square, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        return {
+            "on_move": color,
+            "pieces": ({}, {}),
+            "moves": ([], []),
+            "pieces_defended": ([], []),
+            "check": {
+                "king_piece": 0,
+                "checking_pieces": [],
+            },
+        }
 
     def create_board(self):
         """Create pieces and put them on proper squares
         also put 0, on blank squares
         """
-        for row in range(ROWS):
-            color = "black" if row < 2 else "white"  # color of pieces, rows 0, 1 are black
-            self.board.append([])  # creates row in board
-            for col in range(COLS):
-                if row == 1 or row == 6:
-                    self.board[row].append(Piece(row, col, color, "pawn"))
-                elif row == 0 or row == 7:
-                    self.board[row].append(Piece(row, col, color, self.col_start_pos[col]))
-                else:
-                    self.board[row].append(0)
+        for square in range(SQUARES):
+            row, col = divmod(square, COLS)
+            color = Color.BLACK if row < 2 else Color.WHITE  # color of pieces, rows 0, 1 are black
+            if row == 1 or row == 6:
+                self.board.append(Piece(square, color, PAWN))
+            elif row == 0 or row == 7:
+                self.board.append(Piece(square, color, self.col_start_pos[col]))
+            else:
+                self.board.append(0)
+
+    def set_pieces(self, pieces, color=Color.WHITE, history=()):
+        """Replace every piece on board and regenerate status, used to set up position other than starting one
+        :param pieces: pieces with square and moves already set, king or rook with 0 moves can castle
+        :param color: color on move, it is part of hash
+        :param history: keys of earlier positions since last capture or pawn move, oldest first
+        """
+        self.board = [0] * SQUARES
+        for piece in pieces:
+            self.board[piece.square] = piece
+        self.undo_stack = []
+        self.piece_status = {}
+        self.attacks = [[0] * SQUARES for _ in Color]
+        self.watchers = [set() for _ in range(SQUARES)]
+        self.king_pieces = {}
+        self.update_status(range(SQUARES))
+        self.hash = compute_hash(self.board, color)
+        self.hash_history = list(history)
+        self.start_clock = len(self.hash_history)  # at least one ply for every earlier position
+        self.start_ply = 0
+        self.check_bool = False
+        self.checkmate_bool = False
+        self.draw_bool = False
+        self.draw_reason = None
 
-    def draw(self, win):
-        """Draw first squares, then draw pieces
+    def move(self, piece, square, promotion=None):
+        """Move the piece with make_move, piece standing on square is captured,
+        checks if pawn is on promotion square
         :param piece:
-        :param win:
-        :return:
+        :param square:
+        :param promotion: piece type pawn becomes, if None pawn waits for promote()
+        :return True if pawn has to be promoted:
         """
-        self.draw_squares(win)
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece != 0:
-                    piece.draw_piece(win)
-
-    def move(self, piece, row, col):
-        """Move the piece, simply change current position of piece with another piece or 0 in board[],
-        checks if pawn is on promotion square, and if king is in check, or castle is allowed
-        :param win:
+        self.make_move(piece, square, promotion)
+
+        if (square < COLS or square >= SQUARES - COLS) and piece.piece_type == PAWN:
+            return True
+
+    def make_move(self, piece, square, promotion=None):
+        """Change position in place and push undo record on undo_stack,
+        record is (piece, square, moves, captured, castle_rook, piece_type) from before the move,
+        castle_rook is (rook, rook_square, rook_end_square) or None
         :param piece:
-        :param row:
-        :param col:
+        :param square:
+        :param promotion:
+        :return undo record:
         """
-        if piece.piece_type == "king":  # castle
-            if piece.col == col + 2:
-                long_castle_rook = self.board[row][0]
-                self.board[row][0], self.board[row][3] = self.board[row][0], self.board[row][3]
-                long_castle_rook.move(row, 3)
-                long_castle_rook.moves += 1
-            if piece.col == col - 2:
-                short_castle_rook = self.board[row][7]
-                self.board[row][7], self.board[row][5] = self.board[row][5], self.board[row][7]
-                short_castle_rook.move(row, 5)
-                short_castle_rook.moves += 1
-        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
-        piece.move(row, col)
+        castle_rook = None
+        start = piece.square
+        captured = self.board[square]
+        keys = PIECE_KEYS[piece.color]
+        key = self.hash ^ TURN_KEY ^ keys[piece.piece_type][start] ^ keys[promotion or piece.piece_type][square]
+        if captured != 0:
+            key ^= PIECE_KEYS[captured.color][captured.piece_type][square]
+        rights_change = piece.moves == 0 and piece.piece_type in (KING, ROOK) or captured != 0 and captured.moves == 0
+        if rights_change:
+            key ^= castling_key(self.board)
+        if piece.piece_type == KING and abs(start - square) == 2:  # castle
+            rook_square, rook_end_square = (start - 4, start - 1) if square < start else (start + 3, start + 1)
+            rook = self.board[rook_square]
+            self.board[rook_square], self.board[rook_end_square] = 0, rook
+            rook.move(rook_end_square)
+            rook.moves += 1
+            castle_rook = (rook, rook_square, rook_end_square)
+            key ^= keys[ROOK][rook_square] ^ keys[ROOK][rook_end_square]
+
+        undo = (piece, start, piece.moves, captured, castle_rook, piece.piece_type)
+        self.board[start], self.board[square] = 0, piece
+        changed_squares = [start, square]
+        piece.move(square)
         piece.moves += 1
+        if promotion:
+            piece.piece_type = promotion
+        if castle_rook:
+            changed_squares += castle_rook[1:]
+        if rights_change:
+            key ^= castling_key(self.board)
+        self.update_status(changed_squares)
+        self.undo_stack.append(undo)
+        self.hash_history.append(self.hash)
+        self.hash = key
+        return undo
+
+    def unmake_move(self):
+        """Take back last move from undo_stack, captured piece goes back on its square
+        :return undo record:
+        """
+        undo = self.undo_stack.pop()
+        piece, start, moves, captured, castle_rook, piece_type = undo
+        changed_squares = [piece.square, start]
+        self.board[piece.square] = captured
+        self.board[start] = piece
+        piece.move(start)
+        piece.moves = moves
+        piece.piece_type = piece_type
+        if castle_rook:
+            rook, rook_square, rook_end_square = castle_rook
+            self.board[rook_end_square], self.board[rook_square] = 0, rook
+            rook.move(rook_square)
+            rook.moves -= 1
+            changed_squares += [rook_square, rook_end_square]
+        self.update_status(changed_squares)
+        self.hash = self.hash_history.pop()
+        return undo
+
+    def promote(self, piece, piece_type):
+        """Change type of pawn, which reached last row
+        :param piece:
+        :param piece_type:
+        """
+        self.hash ^= PIECE_KEYS[piece.color][piece.piece_type][piece.square]
+        self.hash ^= PIECE_KEYS[piece.color][piece_type][piece.square]
+        piece.piece_type = piece_type
+        self.update_status([piece.square])
 
-        if (row == 7 or row == 0) and piece.piece_type == "pawn":
-            return True
+    def pieces(self):
+        """Pieces on board, every piece on board has status
+        :return:
+        """
+        return self.piece_status.keys()
 
     def get_piece(self, row, col):
         """Get position of piece
         :param row:
         :param col:
         """
-        return self.board[row][col]
+        return self.board[row * COLS + col]
 
-    def remove(self, row, col):
+    def remove(self, square):
         """Remove pawn from board
-        :param row:
-        :param col:
+        :param square:
         :return:
         """
-        self.board[row][col] = 0
-
-    def attacked_squares(self):
-        """Take status, and return attacked squares including ones behind king
-        list attacked_squares is used by check and checkmate method
-        :return:
+        piece = self.board[square]
+        self.hash ^= PIECE_KEYS[piece.color][piece.piece_type][square] ^ castling_key(self.board)
+        self.board[square] = 0
+        self.hash ^= castling_key(self.board)
+        self.update_status([square])
+
+    def update_status(self, squares):
+        """Regenerate moves only of pieces, which stand on changed squares or looked at them,
+        kings are always regenerated, because their moves depend on squares attacked by enemy
+        :param squares: squares changed by move
         """
-        checking_piece = self.status["check"]["checking_pieces"][0]
-        king = self.status["check"]["king_piece"]
-        attacked_squares = []
-
-        if checking_piece.piece_type == "knight":
-            attacked_squares.append((checking_piece.row, checking_piece.col))
-
-        else:
-            if king.col == checking_piece.col:  # rook, queen
-                row = checking_piece.row
-                step = 1 if king.row > checking_piece.row else -1
-                while row != king.row + step:
-                    row += step
-                    attacked_squares.append((row, king.col))
-
-            if king.row == checking_piece.row:  # rook, queen
-                col = checking_piece.col
-                step = 1 if king.col > checking_piece.col else -1
-                while col != king.col + step:
-                    col += step
-                    attacked_squares.append((king.row, col))
-
-            if king.row != checking_piece.row and king.row != checking_piece.row:  # bishop, queen
-                if king.row < checking_piece.row:
-                    step_row = -1
-                else:
-                    step_row = 1
-                if king.col < checking_piece.col:
-                    step_col = -1
-                else:
-                    step_col = 1
-                start_row, end_row = sorted([king.row + step_row, checking_piece.row])
-                start_col, end_col = sorted([king.col + step_col, checking_piece.col])
-                for i, j in zip(range(start_row, end_row), range(start_col, end_col)):
-                    attacked_squares.append((i, j))
-            attacked_squares.append((checking_piece.row, checking_piece.col))
-
-        return attacked_squares
-
-    def check(self, piece, moves):
-        """Function returns valid moves after king being checked,
-        so if piece.type != "king" these pieces can only block or attack checking pieces
+        self.pin_cache = {}
+        self.move_cache = {}
+        affected = set(self.king_pieces.values())
+        for square in squares:
+            affected |= self.watchers[square]
+            if self.board[square] != 0:
+                affected.add(self.board[square])
+        for piece in affected:
+            self._forget(piece)
+
+        kings = []
+        for piece in affected:
+            if self.board[piece.square] is not piece:  # captured or lifted from board
+                if self.king_pieces.get(piece.color) is piece:
+                    del self.king_pieces[piece.color]
+            elif piece.piece_type == KING:  # attacks of both kings has to be known before their moves
+                kings.append(piece)
+                self._learn(piece, {"moves": {}, "defended_pieces": {}})
+            else:
+                self._learn(piece, self.generate_moves(piece))
+        for king in kings:
+            self.king_pieces[king.color] = king
+            moves = self.generate_moves(king)
+            _, _, attacked, watched = self.piece_status[king]
+            self.piece_status[king] = (moves["moves"], moves["defended_pieces"], attacked, watched)
+
+    def _forget(self, piece):
+        """Remove moves and attacks of piece from status
         :param piece:
-        :param moves:
-        :return:
         """
-        enemy_color = "white" if piece.color == "black" else "black"
-        check_moves = copy.deepcopy(moves)
-        attacked_squares = self.attacked_squares()
-
-        if piece.piece_type != "king":  # block or attack checking piece
-            check_moves["moves"] = {move: val for move, val in moves["moves"].items() if move in attacked_squares}
-            return check_moves
-        if piece.piece_type == "king":
-            checking_piece = self.status["check"]["checking_pieces"][0]
-            if not (checking_piece in self.status[f"{enemy_color}_pieces_defended"]) and (checking_piece.row,
-                                                                                          checking_piece.col) in attacked_squares:  # allows to kill not defended piece while check
-                attacked_squares.pop(attacked_squares.index((checking_piece.row, checking_piece.col)))
-            check_moves["moves"] = {move: val for move, val in moves["moves"].items() if move not in attacked_squares}
-            return check_moves
-
-    def checkmate(self, color):
-        """Check if it is checkmate
+        if piece not in self.piece_status:
+            return
+        _, _, attacked, watched = self.piece_status.pop(piece)
+        attacks = self.attacks[piece.color]
+        for square in attacked:
+            attacks[square] -= 1
+        for square in watched:
+            self.watchers[square].discard(piece)
+
+    def _learn(self, piece, moves):
+        """Add moves and attacks of piece to status,
+        pawn attacks only diagonally and looks also on squares in front of it, king attacks every square around
+        :param piece:
+        :param moves: result of generate_moves
+        """
+        square = piece.square
+        watched = {square}
+        if piece.piece_type == PAWN:
+            attacked = set(PAWN_ATTACKS[piece.color][square])
+            watched.update(PAWN_PUSHES[piece.color][square])
+        elif piece.piece_type == KING:
+            attacked = set(KING_TARGETS[square])
+        else:
+            attacked = set(moves["moves"]) | set(moves["defended_pieces"])
+        watched |= attacked | set(moves["moves"])
+        self.piece_status[piece] = (moves["moves"], moves["defended_pieces"], attacked, watched)
+        attacks = self.attacks[piece.color]
+        for square in attacked:
+            attacks[square] += 1
+        for square in watched:
+            self.watchers[square].add(piece)
+
+    def attackers(self, square, color):
+        """Get pieces of color, which attack square
+        :param square:
         :param color:
         :return:
         """
-        enemy_color = "white" if color == "black" else "black"
-        checking_piece = self.status["check"]["checking_pieces"][0]
-        attacked_squares = self.attacked_squares()
-        kings_moves = []
-        print(self.status)
-        for piece, piece_moves in self.status[ f"{color}_pieces"].items():  # iterate over king moves, if move is not in attacked_squares(including the ones behind king) then add it to list
-            if f"{color}_king" in piece:
-                for move in piece_moves.keys():
-                    if move not in attacked_squares and move not in self.status[f"{enemy_color}_moves"]:
-                        kings_moves.append(move)
-        if checking_piece in self.status[f"{enemy_color}_pieces_defended"]:  # if piece is defended, if not it is not a checkmate
-            if checking_piece not in self.status[f"{color}_moves"] and not any(move in attacked_squares for move in
-                                                                               self.status[
-                                                                                   f"{color}_moves"]) and not kings_moves:  # if checking piece cant be attacked and ally cant block it and king has no other moves it is checkmate
-                self.winner = enemy_color
-                self.checkmate_bool = True
+        if not self.attacks[color][square]:
+            return []
+        return [piece for piece in self.watchers[square]
+                if piece.color == color and square in self.piece_status[piece][2]]
 
-    def get_valid_moves(self, piece, check=False, board=None):
-        """Generate valid moves of piece, these moves are used in almost every function and in self.status
+    def pins_and_checks(self, color):
+        """Scan eight rays from king of color once per position, then look for knights and pawns checking king
+        :param color:
+        :return pins, checks: pins are {pinned piece: squares it can go to, pinning piece included},
+        checks are [(checking piece, squares which block or capture it)]
+        """
+        if color in self.pin_cache:
+            return self.pin_cache[color]
+        pins = {}
+        checks = []
+        king = self.king_pieces.get(color)
+        if king is not None:
+            square = king.square
+            for direction, table in RAYS.items():
+                sliders = (ROOK, QUEEN) if 0 in direction else (BISHOP, QUEEN)
+                ray = table[square]
+                own_piece = None
+                for i, target in enumerate(ray):
+                    piece = self.board[target]
+                    if piece == 0:
+                        continue
+                    if piece.color == color:
+                        if own_piece is not None:  # two own pieces, nothing is pinned on this ray
+                            break
+                        own_piece = piece
+                        continue
+                    if piece.piece_type in sliders:
+                        if own_piece is None:
+                            checks.append((piece, set(ray[:i + 1])))
+                        else:
+                            pins[own_piece] = set(ray[:i + 1])
+                    break
+            for jumper, targets in ((KNIGHT, KNIGHT_TARGETS[square]), (PAWN, PAWN_ATTACKS[color][square])):
+                for target in targets:
+                    piece = self.board[target]
+                    if piece != 0 and piece.color != color and piece.piece_type == jumper:
+                        checks.append((piece, {target}))
+        self.pin_cache[color] = (pins, checks)
+        return pins, checks
+
+    def legal_moves(self, piece):
+        """Get moves of piece, which don't leave own king in check,
+        pinned piece stays on ray of pin and while check piece can only block or capture checking piece
         :param piece:
-        :param check:
-        :param board:
         :return:
         """
+        moves = self.piece_status[piece][0]
+        if piece.piece_type == KING:  # king moves avoid attacked squares already
+            return moves
+        pins, checks = self.pins_and_checks(piece.color)
+        if len(checks) > 1:  # only king can move in double check
+            return {}
+        allowed = checks[0][1] if checks else None
+        if piece in pins:
+            allowed = pins[piece] if allowed is None else allowed & pins[piece]
+        if allowed is None:
+            return moves
+        return {move: target for move, target in moves.items() if move in allowed}
 
-        moves = {
-            "moves": {},
-            "defended_pieces": {},
-        }
-
-        traversals = {
-            "pawn": "_traverse_pawn",
-            "knight": "_traverse_knight",
-            "bishop": "_traverse_bishop",
-            "rook": "_traverse_rook",
-            "queen": "_traverse_queen",
-            "king": "_traverse_king"
-        }
-        move_func = getattr(self, traversals[piece.piece_type])
-        move_result = move_func(piece.row, piece.col, piece.color, board)
-        moves["moves"].update(move_result["moves"])
-        moves["defended_pieces"].update(move_result["defended_pieces"])
+    def legal_move_map(self, color):
+        """Legal moves of every piece of color grouped by square of piece, computed once per position,
+        pieces without moves are left out
+        :param color:
+        :return {square: moves of piece like legal_moves}:
+        """
+        if color not in self.move_cache:
+            move_map = {}
+            for piece in self.piece_status:
+                if piece.color == color:
+                    moves = self.legal_moves(piece)
+                    if moves:
+                        move_map[piece.square] = moves
+            self.move_cache[color] = move_map
+        return self.move_cache[color]
+
+    def generate_legal_moves(self, color, captures_only=False):
+        """Every legal move of color as (piece, square, promotion), promotion is None for other moves,
+        pawn going to last row has one move for every promotion type
+        :param color:
+        :param captures_only: generate only moves, which capture piece or promote pawn
+        :return:
+        """
+        moves = []
+        last_rows = range(COLS) if color == Color.WHITE else range(SQUARES - COLS, SQUARES)
+        for start, piece_moves in self.legal_move_map(color).items():
+            piece = self.board[start]
+            promotes = piece.piece_type == PAWN
+            for square, target in piece_moves.items():
+                if promotes and square in last_rows:
+                    moves += [(piece, square, piece_type) for piece_type in PROMOTION_TYPES]
+                elif target != 0 or not captures_only:
+                    moves.append((piece, square, None))
+        return moves
 
-        if check:
-            check_moves = self.check(piece, moves)
-            return check_moves
+    def in_check(self, color):
+        king = self.king_pieces.get(color)
+        return king is not None and self.attacks[color ^ 1][king.square] > 0
 
-        return moves
+    def termination(self, color):
+        """Decide if game is over, it runs once after every move, legal moves are computed once per position anyway
+        and history is walked only back to last capture or pawn move
+        :param color: color on move
+        :return CHECKMATE, reason of draw or None, checkmate_bool and winner or draw_bool and draw_reason are set:
+        """
+        if not self.legal_move_map(color):
+            if self.in_check(color):
+                self.winner = Color(color ^ 1)
+                self.checkmate_bool = True
+                return CHECKMATE
+            reason = STALEMATE
+        elif self.insufficient_material():
+            reason = INSUFFICIENT_MATERIAL
+        elif self.halfmove_clock() >= FIFTY_MOVE_PLIES:
+            reason = FIFTY_MOVES
+        elif self.repetitions() >= 3:
+            reason = REPETITION
+        else:
+            return None
+        self.draw_bool = True
+        self.draw_reason = reason
+        return reason
 
-    def get_status(self, color, piece_row=None, piece_column=None):
-        """Generate status of game
-        piece_row and piece_column are None default because they are only used in possible_check
-        :param color:
-        :param piece_row:
-        :param piece_column:
+    def insufficient_material(self):
+        """Check if no side can mate, only kings, one knight or bishop, or bishops on squares of one color are left
         :return:
         """
-        status = {
-            "on_move": color,
-            "white_pieces": {},
-            "white_moves": [],
-            "white_pieces_defended": [],
-            "black_pieces": {},
-            "black_moves": [],
-            "black_pieces_defended": [],
-            "check": {
-                "king_piece": 0,
-                "checking_pieces": [],
-            },
+        minors = []
+        for piece in self.pieces():
+            if piece.piece_type in (PAWN, ROOK, QUEEN):
+                return False
+            if piece.piece_type != KING:
+                minors.append(piece)
+        if len(minors) <= 1:
+            return True
+        return all(piece.piece_type == BISHOP for piece in minors) and \
+            len({(piece.row + piece.col) % 2 for piece in minors}) == 1
 
-        }
-        board = self.board
-        if piece_row is not None:
-            board = copy.deepcopy(self.board)
-            board[piece_row][piece_column] = 0
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = board[row][col]
-                if piece != 0:
-                    piece_moves = self.get_valid_moves(piece, board=board)
-                    status[f"{piece.color}_pieces"].update({f"{piece}": piece_moves["moves"]})
-                    status[f"{piece.color}_moves"] += piece_moves["moves"].keys()
-                    status[f"{piece.color}_pieces_defended"] += piece_moves["defended_pieces"].values()
-                    for i in piece_moves["moves"].keys():
-                        if piece_moves["moves"][i] != 0 and piece_moves["moves"][i].piece_type == "king" and \
-                                piece_moves["moves"][i].color != piece.color:
-                            status["check"]["king_piece"] = piece_moves["moves"][i]
-                            status["check"]["checking_pieces"].append(piece)
-        return status
+    def repetitions(self):
+        """Count how many times current position was on board, only positions since last capture or pawn move
+        are compared, because earlier ones can't repeat
+        :return:
+        """
+        count = 1
+        undo_length = len(self.undo_stack)
+        for i in range(1, len(self.hash_history) + 1):  # history can start before first move on undo_stack
+            if self.hash_history[-i] == self.hash:
+                count += 1
+            if i <= undo_length:
+                _, _, _, captured, _, piece_type = self.undo_stack[-i]
+                if captured != 0 or piece_type == PAWN:
+                    break
+        return count
 
-    def possible_check(self, piece):
-        """Prevent of piece movement when king is behind this piece
-        :param piece:
+    def halfmove_clock(self):
+        """Count plies since last capture or pawn move
         :return:
         """
-        valid_moves = {}
-        possible_check_bool = False
-        possible_check = self.get_status(piece.color, piece.row, piece.col)
-        piece_moves = self.get_valid_moves(piece)["moves"]
-        if possible_check["check"]["king_piece"] != 0 and piece.color == possible_check["check"]["king_piece"].color:
-            possible_check_bool = True
-            for checking_piece in possible_check["check"]["checking_pieces"]:
-                for piece_move in piece_moves.keys():
-                    if piece_move == (checking_piece.row, checking_piece.col):
-                        valid_moves = {piece_move}
-        return possible_check_bool, valid_moves
-
-    def castle(self, color, row):
-        """allows to do castle with rook and king
-        :param color:
-        :param row:
+        for i in range(1, len(self.undo_stack) + 1):
+            _, _, _, captured, _, piece_type = self.undo_stack[-i]
+            if captured != 0 or piece_type == PAWN:
+                return i - 1
+        return self.start_clock + len(self.undo_stack)
+
+    def get_valid_moves(self, piece):
+        """Get valid moves of piece from status, these moves are used in almost every function and in self.status,
+        moves don't look at pins and checks, legal_moves does
+        :param piece:
         :return:
         """
-        short_castle = False
-        long_castle = False
-        if self.status["check"]["king_piece"] == 0:  # castle is not allowed while check
-            if self.board[row][0] != 0:
-                if self.board[row][0].color == color and self.board[row][0].piece_type == "rook" and self.board[row][
-                    0].moves == 0 and self.board[row][1] == self.board[row][2] == self.board[row][3] == 0:
-                    long_castle = True
-            if self.board[row][7] != 0:
-                if self.board[row][7].color == color and self.board[row][0].piece_type == "rook" and self.board[row][
-                    7].moves == 0 and self.board[row][5] == self.board[row][6] == 0:
-                    short_castle = True
-        return long_castle, short_castle
+        piece_moves, defended_pieces, _, _ = self.piece_status[piece]
+        return {
+            "moves": piece_moves,
+            "defended_pieces": defended_pieces,
+        }
 
-    def possibly_pawn_pos(self, color, row, col):
-        """Not allowing king to go on pawn protected squares, because pawn direction attack is not like his movement
-        :param color:
-        :param row:
-        :param col:
+    def generate_moves(self, piece):
+        """Generate moves of piece, used by update_status
+        :param piece:
         :return:
         """
-        pawn_attacked_squares = []
-        var = 1
-        if color == "black":
-            var = -1
-        possibly_pawn_pos = [(row, col - 2), (row, col - 1), (row, col + 1), (row, col + 2), (row - 1 * var, col - 2),
-                             (row - 1 * var, col), (row - 1 * var, col + 2),
-                             (row - 2 * var, col - 2), (row - 2 * var, col - 1), (row - 2 * var, col),
-                             (row - 2 * var, col + 1), (row - 2 * var, col + 2)]
-        for possibly_pawn in possibly_pawn_pos:
-            pawn_row, pawn_col = possibly_pawn
-            if 0 <= pawn_row <= 7 and 0 <= pawn_col <= 7:
-                if self.board[pawn_row][pawn_col] != 0 and self.board[pawn_row][pawn_col].piece_type == "pawn" and \
-                        self.board[pawn_row][pawn_col].color != color:
-                    pawn_row = pawn_row + 1 if color == "white" else pawn_row - 1
-                    pawn_attacked_squares.append((pawn_row, pawn_col + 1))
-                    pawn_attacked_squares.append((pawn_row, pawn_col - 1))
-        return pawn_attacked_squares
-
-    def possibly_king_pos(self, color, row, col):
-        """Not allowing kings to go each other zones
+        traversals = {
+            PAWN: self._traverse_pawn,
+            KNIGHT: self._traverse_knight,
+            BISHOP: self._traverse_bishop,
+            ROOK: self._traverse_rook,
+            QUEEN: self._traverse_queen,
+            KING: self._traverse_king
+        }
+        return traversals[piece.piece_type](piece.square, piece.color)
+
+    def get_status(self, color):
+        """Generate status of game from moves kept in piece_status
         :param color:
-        :param row:
-        :param col:
         :return:
         """
-        enemy_king_attacked_squares = []
-
-        possibly_enemy_king_pos = {(row + 2, col - 2): [(row + 1, col - 1)],
-                                   (row + 2, col - 1): [(row + 1, col - 1), (row + 1, col)],
-                                   (row + 2, col): [(row + 1, col - 1), (row + 1, col), (row + 1, col + 1)],
-                                   (row + 2, col + 1): [(row + 1, col), (row + 1, col + 1)],
-                                   (row + 2, col + 2): [(row + 1, col)],
-                                   (row + 1, col - 2): [(row + 1, col - 1), (row, col - 1)],
-                                   (row + 1, col + 2): [(row + 1, col + 1), (row, col + 1)],
-                                   (row, col - 2): [(row + 1, col - 1), (row, col - 1), (row - 1, col - 1)],
-                                   (row, col + 2): [(row + 1, col + 1), (row, col + 1), (row - 1, col + 1)],
-                                   (row - 1, col - 2): [(row - 1, col - 1), (row, col - 1)],
-                                   (row - 1, col + 2): [(row - 1, col + 1), (row, col + 1)],
-                                   (row - 2, col - 2): [(row - 1, col - 1)],
-                                   (row - 2, col - 1): [(row - 1, col - 1), (row - 1, col)],
-                                   (row - 2, col): [(row - 1, col - 1), (row - 1, col), (row - 1, col + 1)],
-                                   (row - 2, col + 1): [(row - 1, col + 1), (row - 1, col)],
-                                   (row - 2, col + 2): [(row - 1, col + 1)]
-                                   }
-
-        for possibly_enemy_king in possibly_enemy_king_pos:
-            enemy_king_row, enemy_king_col = possibly_enemy_king
-            if 0 <= enemy_king_row <= 7 and 0 <= enemy_king_col <= 7:
-                if self.board[enemy_king_row][enemy_king_col] != 0 and self.board[enemy_king_row][enemy_king_col].piece_type == "king" and self.board[enemy_king_row][enemy_king_col].color != color:
-                    enemy_king_attacked_squares += possibly_enemy_king_pos[(enemy_king_row, enemy_king_col)]
-        return enemy_king_attacked_squares
-
-    def _traverse_pawn(self, row, col, color, board=None):
-        """Generate movement and pieces defended by pawn
-        :param row:
-        :param col:
+        status = self.empty_status(color)
+        for piece, (piece_moves, defended_pieces, _, _) in self.piece_status.items():
+            status["pieces"][piece.color][piece.square] = piece_moves
+            status["moves"][piece.color].extend(piece_moves)
+            status["pieces_defended"][piece.color].extend(defended_pieces.values())
+        for king in self.king_pieces.values():
+            checking_pieces = self.attackers(king.square, king.color ^ 1)
+            if checking_pieces:
+                status["check"]["king_piece"] = king
+                status["check"]["checking_pieces"] = checking_pieces
+        return status
+
+    def castle(self, color, square):
+        """allows to do castle with rook and king, king can't be in check
+        and can't go through attacked square
         :param color:
-        :param board:
+        :param square: square of king
         :return:
         """
-        if not board:
-            board = self.board
-        moves = {
-            "moves": {},
-            "defended_pieces": {},
-        }
-
-        piece_moves = board[row][col].moves
-        col_left, col_right = col - 1, col + 1  # used to calculate attacking direction
-        start, stop, step = (row + 1, row + 3, 1) if color == "black" else (row - 1, row - 3, -1)
-        if piece_moves > 0:
-            stop -= step  # if not first move, it goes just 1 square
-        if stop == 9:  # if black pawn promotion do nothing, just promote(it is fix of bug)
-            return moves
-        for r in range(start, stop, step):
-            if board[r][col] == 0:
-                moves["moves"][(r, col)] = board[r][col]
-            if r == start:
-                if col_left >= 0 and board[r][col_left] != 0 and color != board[r][col_left].color:
-                    moves["moves"][(r, col_left)] = board[r][col_left]
-                if col_left >= 0 and board[r][col_left] != 0 and color == board[r][col_left].color:
-                    moves["defended_pieces"][(r, col_left)] = board[r][col_left]
-                if col_right <= 7 and board[r][col_right] != 0 and color != board[r][col_right].color:
-                    moves["moves"][(r, col_right)] = board[r][col_right]
-                if col_right <= 7 and board[r][col_right] != 0 and color == board[r][col_right].color:
-                    moves["defended_pieces"][(r, col_right)] = board[r][col_right]
-        if piece_moves == 0 and board[start][
-            col] != 0:  # it removes 2nd square in front of pawn if on 1st square is anything
-            if (start + step, col) in moves["moves"].keys():
-                moves["moves"].pop((start + step, col))
-        return moves
+        enemy_attacks = self.attacks[color ^ 1]
+        board = self.board
+        short_castle = False
+        long_castle = False
+        if not enemy_attacks[square]:  # castle is not allowed while check
+            rook = board[square - 4]
+            if rook != 0 and rook.color == color and rook.piece_type == ROOK and rook.moves == 0 and \
+                    board[square - 3] == board[square - 2] == board[square - 1] == 0 and \
+                    not enemy_attacks[square - 2] and not enemy_attacks[square - 1]:
+                long_castle = True
+            rook = board[square + 3]
+            if rook != 0 and rook.color == color and rook.piece_type == ROOK and rook.moves == 0 and \
+                    board[square + 1] == board[square + 2] == 0 and \
+                    not enemy_attacks[square + 1] and not enemy_attacks[square + 2]:
+                short_castle = True
+        return long_castle, short_castle
 
-    def _traverse_knight(self, row, col, color, board=None):
-        """Generate movement and pieces defended by knight
-        :param row:
-        :param col:
+    def _traverse_pawn(self, square, color):
+        """Generate movement and pieces defended by pawn, it goes 2 squares only on its first move
+        :param square:
         :param color:
-        :param board:
         :return:
         """
-        if not board:
-            board = self.board
+        board = self.board
         moves = {
             "moves": {},
             "defended_pieces": {},
         }
-        directions = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]  # way that knight jumps
-
-        for direction in directions:
-            r, c = direction
-            if 0 <= row + r <= 7 and 0 <= col + c <= 7:
-                piece = board[row + r][col + c]
-                if piece == 0 or piece.color != color:
-                    moves["moves"][(row + r, col + c)] = piece
-                else:
-                    moves["defended_pieces"][(row + r, col + c)] = piece
 
+        first_move = board[square].moves == 0
+        for i, target in enumerate(PAWN_PUSHES[color][square]):
+            if board[target] != 0 or (i == 1 and not first_move):
+                break
+            moves["moves"][target] = 0
+        for target in PAWN_ATTACKS[color][square]:
+            piece = board[target]
+            if piece != 0:
+                if piece.color != color:
+                    moves["moves"][target] = piece
+                else:
+                    moves["defended_pieces"][target] = piece
         return moves
 
-    def _traverse_bishop(self, row, col, color, board=None):
-        """ Generate movement and pieces defended by bishop
-        :param row:
-        :param col:
+    def _traverse_knight(self, square, color):
+        """Generate movement and pieces defended by knight
+        :param square:
         :param color:
-        :param board:
         :return:
         """
-        if not board:
-            board = self.board
+        board = self.board
         moves = {
             "moves": {},
             "defended_pieces": {},
         }
 
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-
-        for direction in directions:
-            r_step, c_step = direction
-            for i in range(1, 8):
-                r, c = row + i * r_step, col + i * c_step
-                if 0 <= r <= 7 and 0 <= c <= 7:
-                    piece = board[r][c]
-                    if piece == 0 or piece.color != color:
-                        moves["moves"][(r, c)] = piece
-                    if piece != 0:
-                        moves["defended_pieces"][(r, c)] = piece
-                        break
+        for target in KNIGHT_TARGETS[square]:
+            piece = board[target]
+            if piece == 0 or piece.color != color:
+                moves["moves"][target] = piece
+            else:
+                moves["defended_pieces"][target] = piece
 
         return moves
 
-    def _traverse_rook(self, row, col, color, board=None):
-        """Generate movement and pieces defended by rook
-        :param row:
-        :param col:
+    def _traverse_rays(self, rays, color):
+        """Generate movement and pieces defended by sliding piece, every ray ends on first piece
+        :param rays: rays from tables, in order of distance
         :param color:
-        :param board:
         :return:
         """
-        if not board:
-            board = self.board
+        board = self.board
         moves = {
             "moves": {},
             "defended_pieces": {},
         }
 
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-
-        for direction in directions:
-            r_step, c_step = direction
-            r, c = row, col
-            for i in range(1, 8):
-                r += r_step
-                c += c_step
-                if not (0 <= r <= 7) or not (0 <= c <= 7):
-                    break
-                piece = board[r][c]
+        for ray in rays:
+            for target in ray:
+                piece = board[target]
                 if piece == 0:
-                    moves["moves"][(r, c)] = piece
+                    moves["moves"][target] = piece
                 elif piece.color != color:
-                    moves["moves"][(r, c)] = piece
+                    moves["moves"][target] = piece
                     break
                 else:
-                    moves["defended_pieces"][(r, c)] = piece
+                    moves["defended_pieces"][target] = piece
                     break
 
         return moves
 
-    def _traverse_queen(self, row, col, color, board=None):
-        """Generate movement and pieces defended by queen, using rook and bishop traverse
-        :param row:
-        :param col:
+    def _traverse_bishop(self, square, color):
+        """ Generate movement and pieces defended by bishop
+        :param square:
         :param color:
-        :param board:
         :return:
         """
-        if not board:
-            board = self.board
+        return self._traverse_rays(BISHOP_RAYS[square], color)
 
-        moves = {
-            "moves": {},
-            "defended_pieces": {},
-        }
-        moves["moves"].update(self._traverse_bishop(row, col, color, board)["moves"])
-        moves["defended_pieces"].update(self._traverse_bishop(row, col, color, board)["defended_pieces"])
-        moves["moves"].update(self._traverse_rook(row, col, color, board)["moves"])
-        moves["defended_pieces"].update(self._traverse_rook(row, col, color, board)["defended_pieces"])
+    def _traverse_rook(self, square, color):
+        """Generate movement and pieces defended by rook
+        :param square:
+        :param color:
+        :return:
+        """
+        return self._traverse_rays(ROOK_RAYS[square], color)
 
-        return moves
+    def _traverse_queen(self, square, color):
+        """Generate movement and pieces defended by queen, bishop and rook rays together
+        :param square:
+        :param color:
+        :return:
+        """
+        return self._traverse_rays(QUEEN_RAYS[square], color)
 
-    def _traverse_king(self, row, col, color, board=None):
-        enemy_color = "white" if color == "black" else "black"
-        """Generate movement of king, includes also illegal moves
-        :param row:
-        :param col:
+    def _traverse_king(self, square, color):
+        """Generate movement of king, king can't go to squares attacked by enemy,
+        and to square behind itself on line of checking bishop, rook or queen
+        :param square:
         :param color:
-        :param board:
         :return:
         """
+        enemy_attacks = self.attacks[color ^ 1]
         moves = {
             "moves": {},
             "defended_pieces": {},
         }
-        illegal_moves = []
-
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-
-        illegal_moves += self.possibly_pawn_pos(row=row, col=col, color=color)
-        illegal_moves += self.possibly_king_pos(row=row, col=col, color=color)
-        illegal_moves += self.status[f"{enemy_color}_moves"]
-        illegal_moves += [(piece.row, piece.col) for piece in self.status[f"{enemy_color}_pieces_defended"]]
-
-        for direction in directions:
-            r_step, c_step = direction
-            r, c = row + r_step, col + c_step
-            if not (0 <= r <= 7) or not (0 <= c <= 7) or (r, c) in illegal_moves:
-                continue
-            piece = self.board[r][c]
-            if piece == 0:
-                moves["moves"][(r, c)] = piece
-            elif piece.color != color:
-                moves["moves"][(r, c)] = piece
-            else:
-                moves["defended_pieces"][(r, c)] = piece
-
-        if self.board[row][col].moves == 0:
-            long_castle, short_castle = self.castle(color, row)
+        behind_king = []
+        row, col = divmod(square, COLS)
+        for piece in self.attackers(square, color ^ 1):
+            if piece.piece_type in (BISHOP, ROOK, QUEEN):
+                direction = (row > piece.row) - (row < piece.row), (col > piece.col) - (col < piece.col)
+                behind_king += RAYS[direction][square][:1]
+
+        for target in KING_TARGETS[square]:
+            piece = self.board[target]
+            if piece != 0 and piece.color == color:
+                moves["defended_pieces"][target] = piece
+            elif not enemy_attacks[target] and target not in behind_king:
+                moves["moves"][target] = piece
+
+        if self.board[square].moves == 0 and col == 4:
+            long_castle, short_castle = self.castle(color, square)
             if long_castle:
-                moves["moves"][(row, col - 2)] = 0
+                moves["moves"][square - 2] = 0
             if short_castle:
-                moves["moves"][(row, col + 2)] = 0
+                moves["moves"][square + 2] = 0
 
         return moves
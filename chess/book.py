@@ -0,0 +1,193 @@
+"""Polyglot opening book, file is mapped to memory and binary searched by key of position, it is never loaded whole.
+Build book from PGN collection with python -m chess.book games.pgn book.bin
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from collections import Counter
+from chess.board import Board
+from chess.constants import COLS, Color, PieceType, PAWN, KING
+from chess.fen import load_position
+from chess.pgn import parse_san, read_games
+from chess.zobrist import EN_PASSANT_KEYS
+
+ENTRY = struct.Struct(">QHHI")  # key, move, weight, learn, big endian
+PROMOTION_CODES = (None, PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK, PieceType.QUEEN)
+FLIP = 56  # polyglot counts rows from white side, square ^ FLIP is square in the other numbering
+BOOK_PLIES = 20  # how many first moves of every game are put in book
+RESULT_SCORES = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}  # weight added to move by white, black
+MAX_WEIGHT = 0xFFFF
+
+
+def position_key(board, color):
+    """Polyglot key of position, key of board with en passant file added, when pawn of color stands next to
+    pawn, which moved 2 squares in last move, like polyglot does, even if en passant isn't played here
+    :param board:
+    :param color: color on move
+    :return:
+    """
+    key = board.hash
+    if board.undo_stack:
+        piece, start = board.undo_stack[-1][:2]
+        square = piece.square
+        if piece.piece_type == PAWN and abs(square - start) == 2 * COLS:
+            for neighbour in (square - 1, square + 1):
+                other = board.board[neighbour] if neighbour // COLS == square // COLS else 0
+                if other != 0 and other.color == color and other.piece_type == PAWN:
+                    return key ^ EN_PASSANT_KEYS[square % COLS]
+    return key
+
+
+def encode_move(start, square, promotion=None, piece_type=None):
+    """Polyglot code of move, castling is written as king takes its rook
+    :param start:
+    :param square:
+    :param promotion:
+    :param piece_type: type of moved piece, needed for castling
+    :return:
+    """
+    if piece_type == KING and abs(square - start) == 2:
+        square = start + 3 if square > start else start - 4
+    return (square ^ FLIP) | (start ^ FLIP) << 6 | PROMOTION_CODES.index(promotion) << 12
+
+
+def decode_move(board, code):
+    """Move of polyglot code, as it is played in board
+    :param board:
+    :param code:
+    :return (start, square, promotion):
+    """
+    start, square = (code >> 6 & 63) ^ FLIP, (code & 63) ^ FLIP
+    piece = board.board[start]
+    if piece != 0 and piece.piece_type == KING and abs(square - start) in (3, 4):  # king takes rook, it's castling
+        square = start + 2 if square > start else start - 2
+    return start, square, PROMOTION_CODES[code >> 12 & 7]
+
+
+class OpeningBook:
+    def __init__(self, path):
+        """
+        file is mapped for reading, pages are loaded when they are read and shared by processes, which use the book
+        entries are sorted by key, moves of one position are next to each other
+        """
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""  # empty can't be mapped
+        self.size = size // ENTRY.size
+
+    def entries(self, key):
+        """Find entries of position with binary search
+        :param key: polyglot key of position
+        :return generator of (key, move, weight, learn):
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.size:
+            entry = ENTRY.unpack_from(self.data, low * ENTRY.size)
+            if entry[0] != key:
+                return
+            yield entry
+            low += 1
+
+    def moves(self, board, color):
+        """Book moves of position, moves which can't be played in board are skipped
+        :param board:
+        :param color: color on move
+        :return list of ((start, square, promotion), weight):
+        """
+        entries = list(self.entries(position_key(board, color)))
+        if not entries:
+            return []
+        legal = {(piece.square, square, promotion) for piece, square, promotion in board.generate_legal_moves(color)}
+        moves = []
+        for _, code, weight, _ in entries:
+            move = decode_move(board, code)
+            if move in legal:
+                moves.append((move, weight))
+        return moves
+
+    def choose(self, board, color, rng=random):
+        """Pick book move, better moves are picked more often
+        :param board:
+        :param color: color on move
+        :param rng: random generator
+        :return (piece, square, promotion) or None when position isn't in book:
+        """
+        moves = [(move, weight) for move, weight in self.moves(board, color) if weight]
+        if not moves:
+            return None
+        start, square, promotion = rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+        return board.board[start], square, promotion
+
+    def close(self):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+
+def build(pgn_path, book_path, plies=BOOK_PLIES, min_games=1):
+    """Create book from games, weight of move is 2 for win and 1 for draw of player, who played it
+    :param pgn_path:
+    :param book_path:
+    :param plies: only first plies of every game are used
+    :param min_games: moves played in fewer games are left out
+    :return number of games, number of entries:
+    """
+    weights = Counter()
+    counts = Counter()
+    games = 0
+    with open(pgn_path, encoding="utf-8", errors="replace") as file:
+        for headers, moves in read_games(file):
+            if "FEN" in headers:
+                try:
+                    board, color = load_position(headers["FEN"])
+                except ValueError:  # broken FEN, game is skipped
+                    continue
+            else:
+                board, color = Board(), Color.WHITE
+            scores = RESULT_SCORES.get(headers.get("Result"), (1, 1))
+            for san in moves[:plies]:
+                try:
+                    piece, square, promotion = parse_san(board, color, san)
+                except ValueError:  # en passant or broken game, rest of it is skipped
+                    break
+                entry = position_key(board, color), encode_move(piece.square, square, promotion, piece.piece_type)
+                counts[entry] += 1
+                weights[entry] += scores[color]
+                board.move(piece, square, promotion)
+                color ^= 1
+            games += 1
+
+    entries = sorted(((key, move, weights[key, move]) for (key, move), count in counts.items()
+                      if count >= min_games and weights[key, move]), key=lambda entry: (entry[0], -entry[2]))
+    scale = max((weight for *_, weight in entries), default=0) / MAX_WEIGHT
+    with open(book_path, "wb") as file:
+        for key, move, weight in entries:
+            weight = max(1, int(weight / scale)) if scale > 1 else weight
+            file.write(ENTRY.pack(key, move, weight, 0))
+    return games, len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.book", description=__doc__)
+    parser.add_argument("pgn", help="games to read")
+    parser.add_argument("book", help="book file to write")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES, help="moves of every game put in book")
+    parser.add_argument("--min-games", type=int, default=1, help="leave out moves played in fewer games")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    games, entries = build(args.pgn, args.book, args.plies, args.min_games)
+    print(f"{games} games  {entries} entries  {os.path.getsize(args.book)} bytes  "
+          f"{time.perf_counter() - start:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,32 @@
-import pygame
+from enum import IntEnum
+
 
 WIDTH, HEIGHT = 800, 800  # size of window
 ROWS, COLS = 8, 8  # size of chess board
+SQUARES = ROWS * COLS  # squares are numbered 0..63, square = row * COLS + col
 SQUARE_SIZE = WIDTH//COLS  # size of one square in px
 
 WHITE = (255, 255, 255)  # white color, used to generate screen
 BLACK = (0, 0, 0)  # not in use right now
+
+
+class Color(IntEnum):
+    """Color of pieces, enemy of color is color ^ 1
+    """
+    WHITE = 0
+    BLACK = 1
+
+
+class PieceType(IntEnum):
+    """Type of piece, 0 is left for empty square
+    """
+    PAWN = 1
+    KNIGHT = 2
+    BISHOP = 3
+    ROOK = 4
+    QUEEN = 5
+    KING = 6
+
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = PieceType  # plain names, attribute lookup on enum is slow in move generation
+PROMOTION_TYPES = [QUEEN, ROOK, KNIGHT, BISHOP]  # pieces to choose in pawn promotion
@@ -0,0 +1,57 @@
+"""Compact encoding of position, used to send positions between processes instead of pickled boards.
+Position is 64 bytes of Piece.code (0 for empty square, UNMOVED bit set for pieces with 0 moves),
+one byte of color on move and 8 byte keys of earlier positions, which still can be repeated.
+"""
+import struct
+from chess.board import Board
+from chess.constants import SQUARES, Color, PieceType, PAWN
+from chess.piece import Piece
+
+UNMOVED = 0x10  # piece has 0 moves, pawn can go 2 squares, king and rook can castle
+COLOR_BIT = 3  # Piece.code is color << 3 | piece_type
+TYPE_MASK = 0x07
+
+
+def encode(board, color):
+    """Encode position of board and keys of positions since last capture or pawn move
+    :param board:
+    :param color: color on move
+    :return bytes:
+    """
+    codes = bytes(0 if piece == 0 else piece.code | (UNMOVED if piece.moves == 0 else 0) for piece in board.board)
+    history = []
+    for i in range(1, len(board.hash_history) + 1):
+        history.append(board.hash_history[-i])
+        if i <= len(board.undo_stack):
+            _, _, _, captured, _, piece_type = board.undo_stack[-i]
+            if captured != 0 or piece_type == PAWN:
+                break
+    history.reverse()
+    return codes + bytes((color,)) + struct.pack(f"<{len(history)}Q", *history)
+
+
+def decode_pieces(codes):
+    """Create pieces from 64 codes
+    :param codes:
+    :return list of pieces:
+    """
+    pieces = []
+    for square, code in enumerate(codes):
+        if code:
+            piece = Piece(square, Color(code >> COLOR_BIT & 1), PieceType(code & TYPE_MASK))
+            piece.moves = 0 if code & UNMOVED else 1
+            pieces.append(piece)
+    return pieces
+
+
+def decode(data, board_class=Board):
+    """Create board from encoded position, history keys are put in hash_history, so repetitions are found
+    :param data:
+    :param board_class:
+    :return board, color on move:
+    """
+    color = Color(data[SQUARES])
+    history = struct.unpack_from(f"<{(len(data) - SQUARES - 1) // 8}Q", data, SQUARES + 1)
+    board = board_class()
+    board.set_pieces(decode_pieces(data[:SQUARES]), color, history)
+    return board, color
@@ -0,0 +1,432 @@
+"""Computer opponent, iterative deepening negamax with alpha-beta pruning on top of Board rules
+"""
+import time
+from chess.constants import SQUARES, Color, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from chess.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE = 100000  # score of mate, mate in n plies is MATE - n
+MATE_BOUND = MATE - 1000  # scores above are mates
+INFINITY = MATE + 1
+MAX_DEPTH = 64
+PIECE_VALUES = {PAWN: 100, KNIGHT: 320, BISHOP: 330, ROOK: 500, QUEEN: 900, KING: 0}
+ENDGAME_MATERIAL = 1300  # king goes to center, when pieces without pawns of both sides are worth less
+
+# piece-square tables of white, first row is row 0 of board (8th rank), black uses square ^ 56
+PIECE_SQUARE_TABLES = {
+    PAWN: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ),
+    ROOK: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ),
+    QUEEN: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ),
+}
+KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+
+def _color_table(table, color, value=0):
+    """Table of color with piece value added, black reads white table upside down
+    :param table:
+    :param color:
+    :param value:
+    :return:
+    """
+    return tuple(value + table[square if color == Color.WHITE else square ^ 56] for square in range(SQUARES))
+
+
+# [color][piece_type][square], material included, piece type 0 is unused
+SQUARE_VALUES = tuple({piece_type: _color_table(table, color, PIECE_VALUES[piece_type])
+                       for piece_type, table in PIECE_SQUARE_TABLES.items()} for color in Color)
+KING_ENDGAME_VALUES = tuple(_color_table(KING_ENDGAME_TABLE, color) for color in Color)
+
+
+def evaluate(board, color):
+    """Material and piece-square score of position, positive is better for color
+    :param board:
+    :param color: color on move
+    :return:
+    """
+    scores = [0, 0]
+    material = 0
+    kings = []
+    for piece in board.pieces():
+        piece_type = piece.piece_type
+        if piece_type == KING:
+            kings.append(piece)
+            continue
+        scores[piece.color] += SQUARE_VALUES[piece.color][piece_type][piece.square]
+        if piece_type != PAWN:
+            material += PIECE_VALUES[piece_type]
+    for king in kings:
+        if material < ENDGAME_MATERIAL:
+            scores[king.color] += KING_ENDGAME_VALUES[king.color][king.square]
+        else:
+            scores[king.color] += SQUARE_VALUES[king.color][KING][king.square]
+    return scores[color] - scores[color ^ 1]
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Engine:
+    def __init__(self, depth=None, movetime=None, table_size=1 << 18, book=None, tablebase=None):
+        """
+        strength is max depth in plies or time of one move in ms, depth 3 is used when none is given,
+        with both search stops at the first limit reached
+        book is OpeningBook, its moves are played without search
+        tablebase is Tablebase, positions in it are played perfectly at root and aren't searched deeper in tree
+        info is result of last finished iteration: depth, score, best move, nodes, time and nodes per second
+        killers are 2 quiet moves per ply, which caused beta cutoff, history is cutoff score of (color, start, square)
+        """
+        self.depth = depth if depth or movetime else 3
+        self.movetime = movetime
+        self.table = TranspositionTable(table_size)
+        self.book = book
+        self.tablebase = tablebase
+        self.info = {}
+        self.board = None
+        self.nodes = 0
+        self.deadline = None
+        self.stopped = None
+        self.killers = []
+        self.history = {}
+
+    def search(self, board, color, report=None, stopped=None):
+        """Search best move of color with iterative deepening, every iteration starts with best move of previous one
+        :param board: Board or BitboardBoard, it is restored after search
+        :param color: color on move
+        :param report: called with info after every finished iteration
+        :param stopped: search is stopped when it returns True, best move found so far is returned
+        :return (piece, square, promotion) or None when there is no legal move:
+        """
+        self._prepare(board)
+        self.stopped = stopped
+        self.table.new_search()
+        start = time.perf_counter()
+        deadline = start + self.movetime / 1000 if self.movetime else None
+        self.info = {}
+        if self.book:
+            move = self.book.choose(board, color)
+            if move:
+                self.info = {"move": move, "book": True}
+                return move
+        if self.tablebase:
+            found = self.tablebase.best_move(board, color)
+            if found:
+                move, (result, plies) = found
+                self.info = {"move": move, "score": result * (MATE - plies), "plies": plies, "tablebase": True}
+                return move
+        moves = board.generate_legal_moves(color)
+        if not moves:
+            return None
+
+        best_move = moves[0]
+        undo_length = len(board.undo_stack)
+        for depth in range(1, (self.depth or MAX_DEPTH) + 1):
+            self.deadline = deadline if depth > 1 else None  # first iteration is always finished
+            try:
+                score, move = self._root(moves, depth, color)
+            except SearchTimeout:
+                while len(board.undo_stack) > undo_length:
+                    board.unmake_move()
+                break
+            best_move = move
+            moves.remove(move)
+            moves.insert(0, move)
+            elapsed = time.perf_counter() - start
+            self.info = {
+                "depth": depth,
+                "score": score,
+                "move": move,
+                "nodes": self.nodes,
+                "time": elapsed,
+                "nps": int(self.nodes / elapsed) if elapsed else 0,
+            }
+            if report:
+                report(self.info)
+            if abs(score) > MATE_BOUND or len(moves) == 1:
+                break
+            if deadline and time.perf_counter() + elapsed * 2 > deadline:  # next iteration won't finish
+                break
+        return best_move
+
+    def search_move(self, board, color, move, depth, alpha=-INFINITY, beta=INFINITY, movetime=None, stopped=None):
+        """Score of one root move searched to depth, used by workers of parallel search
+        :param board: it is restored after search
+        :param color: color on move
+        :param move: (start, square, promotion)
+        :param depth:
+        :param alpha:
+        :param beta:
+        :param movetime: ms, search is stopped after it
+        :param stopped: search is stopped when it returns True
+        :return score for color, None when time ran out or search was stopped:
+        """
+        self._prepare(board)
+        self.stopped = stopped
+        self.deadline = time.perf_counter() + movetime / 1000 if movetime else None
+        start, square, promotion = move
+        undo_length = len(board.undo_stack)
+        try:
+            board.move(board.board[start], square, promotion)
+            return -self._negamax(depth - 1, -beta, -alpha, color ^ 1, 1)
+        except SearchTimeout:
+            return None
+        finally:
+            while len(board.undo_stack) > undo_length:
+                board.unmake_move()
+
+    def _prepare(self, board):
+        """Reset counters and killer moves before search, history is kept but it matters less
+        :param board:
+        """
+        self.board = board
+        self.nodes = 0
+        self.stopped = None
+        self.killers = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        self.history = {key: value // 8 for key, value in self.history.items()}
+
+    def _root(self, moves, depth, color):
+        """Search every root move, first move is searched with full window
+        :param moves:
+        :param depth:
+        :param color:
+        :return score, best move:
+        """
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        for move in moves:
+            piece, square, promotion = move
+            self.board.move(piece, square, promotion)
+            score = -self._negamax(depth - 1, -beta, -alpha, color ^ 1, 1)
+            self.board.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self.table.store(self.board.hash, depth, alpha, EXACT, self._move_key(best_move))
+        return alpha, best_move
+
+    @staticmethod
+    def _move_key(move):
+        piece, square, promotion = move
+        return piece.square, square, promotion
+
+    def _tick(self):
+        """Count node and stop search after deadline or when it was stopped from outside
+        """
+        self.nodes += 1
+        if self.nodes & 511 == 0 and (self.deadline and time.perf_counter() > self.deadline or
+                                      self.stopped is not None and self.stopped()):
+            raise SearchTimeout
+
+    def _negamax(self, depth, alpha, beta, color, ply):
+        """Score of position for color, searched depth plies and quiescence after
+        :param depth:
+        :param alpha: score color already has
+        :param beta: score enemy already has
+        :param color:
+        :param ply: distance from root
+        :return:
+        """
+        board = self.board
+        self._tick()
+        if board.repetitions() > 1:
+            return 0
+        if self.tablebase is not None:
+            probed = self.tablebase.probe(board, color)
+            if probed is not None:
+                result, plies = probed
+                return result * (MATE - ply - plies)
+        in_check = board.in_check(color)
+        if in_check:
+            depth += 1  # don't let check push threat behind the horizon
+        if depth <= 0 or ply >= MAX_DEPTH:
+            return self._quiescence(alpha, beta, color, ply)
+
+        key = board.hash
+        entry = self.table.probe(key)
+        table_move = None
+        if entry is not None:
+            _, entry_depth, score, flag, table_move, _ = entry
+            if entry_depth >= depth:
+                score = self._from_table(score, ply)
+                if flag == EXACT or flag == LOWER and score >= beta or flag == UPPER and score <= alpha:
+                    return score
+
+        moves = board.generate_legal_moves(color)
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for move in self._order(moves, color, ply, table_move):
+            piece, square, promotion = move
+            quiet = board.board[square] == 0 and promotion is None
+            board.move(piece, square, promotion)
+            score = -self._negamax(depth - 1, -beta, -alpha, color ^ 1, ply + 1)
+            board.unmake_move()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    self._remember_cutoff(move, color, depth, ply)
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, depth, self._to_table(best_score, ply), flag, self._move_key(best_move))
+        return best_score
+
+    def _quiescence(self, alpha, beta, color, ply):
+        """Search only captures and promotions, until position is quiet,
+        color can also stay with static evaluation (stand pat)
+        :param alpha:
+        :param beta:
+        :param color:
+        :param ply:
+        :return:
+        """
+        self._tick()
+        stand_pat = evaluate(self.board, color)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        if ply >= MAX_DEPTH:
+            return alpha
+        board = self.board
+        for move in self._order(board.generate_legal_moves(color, captures_only=True), color, ply, None):
+            piece, square, promotion = move
+            board.move(piece, square, promotion)
+            score = -self._quiescence(-beta, -alpha, color ^ 1, ply + 1)
+            board.unmake_move()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def _order(self, moves, color, ply, table_move):
+        """Sort moves, best move from transposition table first, then captures by MVV-LVA
+        (most valuable victim, least valuable attacker) and promotions, then killer moves and history score
+        :param moves:
+        :param color:
+        :param ply:
+        :param table_move: (start, square, promotion) or None
+        :return:
+        """
+        board = self.board
+        killers = self.killers[ply] if ply <= MAX_DEPTH else ()
+        history = self.history
+
+        def priority(move):
+            piece, square, promotion = move
+            key = (piece.square, square, promotion)
+            if key == table_move:
+                return 1 << 30
+            target = board.board[square]
+            if target != 0 or promotion:
+                victim = PIECE_VALUES[target.piece_type] if target != 0 else 0
+                return (1 << 24) + 10 * (victim + PIECE_VALUES[promotion or PAWN]) - PIECE_VALUES[piece.piece_type]
+            if key in killers:
+                return 1 << 20
+            return history.get((color, piece.square, square), 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _remember_cutoff(self, move, color, depth, ply):
+        piece, square, promotion = move
+        key = (piece.square, square, promotion)
+        killers = self.killers[ply]
+        if killers[0] != key:
+            killers[1], killers[0] = killers[0], key
+        history_key = (color, piece.square, square)
+        self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+
+    @staticmethod
+    def _to_table(score, ply):
+        """Mate scores are stored as distance from position, not from root
+        :param score:
+        :param ply:
+        :return:
+        """
+        if score > MATE_BOUND:
+            return score + ply
+        if score < -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_table(score, ply):
+        if score > MATE_BOUND:
+            return score - ply
+        if score < -MATE_BOUND:
+            return score + ply
+        return score
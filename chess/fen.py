@@ -0,0 +1,121 @@
+"""FEN of positions, board is set up straight from FEN and written back to it, no moves are replayed.
+Castling rights are kept in moves of kings and rooks, king or rook with 0 moves can castle,
+en passant isn't implemented, so its field is read and written as -
+"""
+from chess.board import Board
+from chess.constants import COLS, ROWS, SQUARES, Color, PieceType, PAWN, ROOK, KING
+from chess.piece import Piece
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PIECE_LETTERS = " pnbrqk"  # index is piece type
+LETTERS = {(letter.upper() if color == Color.WHITE else letter): (color, PieceType(piece_type))
+           for piece_type, letter in enumerate(PIECE_LETTERS) if piece_type for color in Color}
+SIDES = {"w": Color.WHITE, "b": Color.BLACK}
+KING_SQUARES = (60, 4)  # starting square of king of every color
+CASTLING_ROOKS = (("K", Color.WHITE, 63), ("Q", Color.WHITE, 56), ("k", Color.BLACK, 7), ("q", Color.BLACK, 0))
+PAWN_ROWS = (6, 1)  # starting row of pawns of every color, pawns there haven't moved
+
+
+def parse_placement(placement):
+    """Pieces of placement field, row 8 is first like in FEN
+    :param placement: like rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR
+    :return list of (square, color, piece_type):
+    """
+    rows = placement.split("/")
+    if len(rows) != ROWS:
+        raise ValueError(f"{placement} hasn't {ROWS} rows")
+    pieces = []
+    for row, text in enumerate(rows):
+        col = 0
+        for char in text:
+            if char.isdigit():
+                col += int(char)
+            elif char in LETTERS:
+                pieces.append((row * COLS + col, *LETTERS[char]))
+                col += 1
+            else:
+                raise ValueError(f"{char} isn't a piece in {placement}")
+        if col != COLS:
+            raise ValueError(f"row {ROWS - row} of {placement} hasn't {COLS} squares")
+    return pieces
+
+
+def load_position(fen, board_class=Board):
+    """Set up board from FEN, castling rights become 0 moves of king and rook, every other king and rook
+    has 1 move, halfmove clock and move number are kept in board.start_clock and board.start_ply
+    :param fen: halfmove clock and move number can be left out
+    :param board_class:
+    :return board, color on move:
+    """
+    fields = fen.split()
+    if len(fields) < 2 or fields[1] not in SIDES:
+        raise ValueError(f"{fen} has no side to move")
+    castling = fields[2] if len(fields) > 2 else "-"
+    color = SIDES[fields[1]]
+    rook_squares = {square for right, _, square in CASTLING_ROOKS if right in castling}
+    pieces = []
+    for square, piece_color, piece_type in parse_placement(fields[0]):
+        piece = Piece(square, piece_color, piece_type)
+        if piece_type == PAWN:
+            piece.moves = 0 if square // COLS == PAWN_ROWS[piece_color] else 1
+        elif piece_type == KING:
+            rights = "KQ" if piece_color == Color.WHITE else "kq"
+            piece.moves = 0 if square == KING_SQUARES[piece_color] and any(right in castling for right in rights) else 1
+        elif piece_type == ROOK:
+            piece.moves = 0 if square in rook_squares else 1
+        else:
+            piece.moves = 1
+        pieces.append(piece)
+    board = board_class()
+    board.set_pieces(pieces, color)
+    try:
+        board.start_clock = int(fields[4]) if len(fields) > 4 else 0
+        board.start_ply = 2 * (int(fields[5]) - 1) + color if len(fields) > 5 else color
+    except ValueError:
+        raise ValueError(f"{fen} has broken move counters") from None
+    return board, color
+
+
+def castling_rights(board):
+    """Castling field of board, king and rook, which haven't moved, can castle
+    :param board:
+    :return like KQkq or -:
+    """
+    rights = ""
+    for right, color, square in CASTLING_ROOKS:
+        king, rook = board.board[KING_SQUARES[color]], board.board[square]
+        if king != 0 and king.piece_type == KING and king.color == color and king.moves == 0 and \
+                rook != 0 and rook.piece_type == ROOK and rook.color == color and rook.moves == 0:
+            rights += right
+    return rights or "-"
+
+
+def dump_placement(board):
+    """Placement field of board
+    :param board:
+    :return:
+    """
+    rows = []
+    for row in range(0, SQUARES, COLS):
+        text, empty = "", 0
+        for piece in board.board[row:row + COLS]:
+            if piece == 0:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            letter = PIECE_LETTERS[piece.piece_type]
+            text += letter.upper() if piece.color == Color.WHITE else letter
+        rows.append(text + str(empty) if empty else text)
+    return "/".join(rows)
+
+
+def dump_position(board, color):
+    """FEN of board
+    :param board:
+    :param color: color on move
+    :return:
+    """
+    ply = board.start_ply + len(board.undo_stack)
+    return f"{dump_placement(board)} {'wb'[color]} {castling_rights(board)} - {board.halfmove_clock()} {ply // 2 + 1}"
@@ -1,42 +1,107 @@
-import copy
 import pygame
+from chess.analysis import DONE
 from chess.board import Board
-from chess.constants import SQUARE_SIZE, HEIGHT, WIDTH
+from chess.constants import COLS, ROWS, SQUARES, Color, PROMOTION_TYPES, PAWN, KING
+from chess.fen import dump_position, load_position
+from chess.renderer import Renderer
+
+CHECK_EXPIRED = pygame.USEREVENT + 1  # event posted when CHECK text should disappear
+CHECK_DISPLAY_TIME = 1500  # how long CHECK text is displayed in ms
 
 
 class Game:
-    def __init__(self, win):
+    def __init__(self, win, board_class=Board, engine=None, engine_color=None, book=None, log=None):
+        """
+        board_class is rules core used by game, Board or BitboardBoard
+        engine is EngineService, it plays pieces of engine_color, when both are given, otherwise two players alternate
+        book is OpeningBook, book moves of selected piece are hinted
+        log is GameLog, every move and takeback is written to it, game ends in log when it is restarted
+        start_fen is position of last load_fen, reset restarts from it, None for normal start
+        """
+        self.board_class = board_class
+        self.start_fen = None
+        self.book = book
+        self.log = log
+        self.engine = engine
+        self.engine_color = engine_color if engine is not None else None
         self._init()
         self.win = win
+        self.renderer = Renderer(win)
 
     def update(self):
-        """update window of game
+        """update window of game, only squares that changed are redrawn
         """
-        self.board.draw(self.win)
-        self.draw_valid_moves(self.valid_moves)
-        if self.pawn_promotion:
-            self.draw_pawn_promotion()
-        if self.board.checkmate_bool:
-            self.draw_checkmate()
-        elif self.display_check:
-            self.draw_check()
-        pygame.display.update()
+        self.renderer.render(self)
 
     def _init(self):
         self.selected = None
-        self.board = Board()
-        self.turn = "white"
+        self.board = self.board_class()
+        self.turn = Color.WHITE
         self.valid_moves = {}
-        self.check = None
+        self.book_moves = set()  # squares of valid_moves, which are in opening book
+        self.check = None  # color, which is in check
         self.display_check = False
         self.pawn_promotion = False
         self.to_promote = None
+        self.redo_stack = []  # moves taken back with undo, newest last
+        self.thinking = False  # engine searches position on board
 
     def reset(self):
-        """restart game
+        """restart game from its starting position, which is position of last load_fen or normal start
+        :return:
+        """
+        if self.start_fen:
+            self.load_fen(self.start_fen)
+        else:
+            self._restart()
+
+    def _restart(self):
+        """end game and put pieces to normal start
         :return:
         """
+        pygame.time.set_timer(CHECK_EXPIRED, 0)
+        if self.engine:
+            self.engine.cancel()
+        if self.log:
+            self.log.end(self.result())
         self._init()
+        self.renderer.mark_all()
+
+    def load_fen(self, fen):
+        """Restart game from position of FEN, pawn on last row waits for promotion like after its move,
+        reset returns to this position later
+        :param fen:
+        :return:
+        """
+        board, turn = load_position(fen, self.board_class)  # broken FEN raises ValueError before game changes
+        self._restart()
+        self.start_fen = fen
+        if self.log:
+            self.log.start(fen)
+        self.board, self.turn = board, turn
+        for square in list(range(COLS)) + list(range(SQUARES - COLS, SQUARES)):
+            pawn = self.board.board[square]
+            last_row = 0 if pawn != 0 and pawn.color == Color.WHITE else ROWS - 1
+            if pawn != 0 and pawn.piece_type == PAWN and square // COLS == last_row:
+                self.selected = pawn
+                self.pawn_promotion = True
+                self.set_promotion()
+                break
+        self.is_check()
+
+    def result(self):
+        """Result of game like in PGN, * when it isn't over
+        :return:
+        """
+        if self.board.checkmate_bool:
+            return "1-0" if self.board.winner == Color.WHITE else "0-1"
+        return "1/2-1/2" if self.board.draw_bool else "*"
+
+    def fen(self):
+        """FEN of position on board, pawn waiting for promotion stays on last row
+        :return:
+        """
+        return dump_position(self.board, self.turn)
 
     def select(self, row, col):
         """select piece by clicking on it
@@ -44,138 +109,219 @@ class Game:
         :param col:
         :return:
         """
+        square = row * COLS + col
+        if self.board.checkmate_bool or self.board.draw_bool:  # game is over, it can be only restarted or taken back
+            return False
+        if self.turn == self.engine_color and not self.pawn_promotion:  # pieces of engine can't be moved by user
+            return False
         if self.pawn_promotion: # pawn promotion
-            pawn = self.board.get_piece(self.to_promote[0].row, self.to_promote[0].col)
-            pawn.piece_type = self.to_promote[1][row]
+            if square not in self.to_promote[1]:  # only pieces in column of pawn can be chosen
+                return False
+            pawn = self.to_promote[0]
+            self.board.promote(pawn, self.to_promote[1][square])
+            if self.board.undo_stack and self.board.undo_stack[-1][0] is pawn:  # move of pawn is written now
+                self._record(self.board.undo_stack[-1][1], pawn.square, pawn.piece_type)
+            elif self.log:  # pawn was on last row in FEN, game in log starts after promotion
+                self.log.start(self.fen())
+            self.renderer.mark(*self.to_promote[1])
             self.pawn_promotion = False
             self.to_promote = None
+            self.is_check()
 
         if self.selected:
-            result = self._move(row, col)
+            result = self._move(square)
             if not result:
                 self.selected = None
                 self.select(row, col)
 
-        piece = self.board.get_piece(row, col)
+        piece = self.board.board[square]
         if piece != 0 and piece.color == self.turn:
             self.selected = piece
 
-            possible_check_bool, possible_check_moves = self.board.possible_check(piece)
-            if not self.check and possible_check_bool:  # check if piece can move
-                self.valid_moves = possible_check_moves
-            else:
-                self.valid_moves = self.board.get_valid_moves(piece, self.board.check_bool)["moves"]
+            self.renderer.mark(*self.valid_moves)  # hide hints of previous selection
+            self.valid_moves = self.board.legal_move_map(self.turn).get(square, {})
+            self.book_moves = self.get_book_moves(piece)
+            self.renderer.mark(*self.valid_moves)
             return True
 
         return False
 
-    def _move(self, row, col):
-        """move piece from one square to another, if something is on another square remove it
-        :param row:
-        :param col:
+    def _move(self, square, promotion=None):
+        """move piece from one square to another, if something is on another square board captures it
+        :param square:
+        :param promotion: piece type of promoted pawn, if None user chooses it
         :return:
         """
-        piece = self.board.get_piece(row, col)
-        if self.selected and (row, col) in self.valid_moves:
-            if piece != 0:
-                self.board.remove(row, col)
-
-            if self.board.move(self.selected, row, col):
+        if self.selected and square in self.valid_moves:
+            self.redo_stack = []
+            self.renderer.mark(self.selected.square, square)
+            if self.selected.piece_type == KING and abs(self.selected.square - square) == 2:  # castle moves rook too
+                row_start = square - square % COLS
+                self.renderer.mark(row_start, row_start + 3, row_start + 5, row_start + 7)
+            start = self.selected.square
+            if self.board.move(self.selected, square, promotion):  # move is written, when piece is chosen
                 self.pawn_promotion = True
+                self.set_promotion()
                 self.update()
+            else:
+                self._record(start, square, promotion)
 
             self.change_turn()
-            self.board.status = self.board.get_status(self.turn)  # update status of board
             self.is_check()
         else:
             return False
 
         return True
 
-    def draw_valid_moves(self, moves):
-        """Draw circles on allowed squares to move
-        :param moves:
+    def undo(self):
+        """take back last move, it can be made again with redo
         :return:
         """
-        for move in moves:
-            col, row = move
-            pygame.draw.circle(self.win, (125, 125, 125),
-                               (row * SQUARE_SIZE + SQUARE_SIZE // 2, col * SQUARE_SIZE + SQUARE_SIZE // 2), 15)
+        if not self.board.undo_stack:
+            return
+        piece, *_, piece_type = self.board.undo_stack[-1]
+        promotion = piece.piece_type if piece.piece_type != piece_type else None
+        if self.log and not self.pawn_promotion:  # move waiting for promotion isn't written yet
+            self.log.takeback()
+        self.redo_stack.append((piece, piece.square, promotion))
+        self.board.unmake_move()
+        self.pawn_promotion = False
+        self.to_promote = None
+        self._after_takeback()
+        if self.engine_turn() and self.board.undo_stack:  # take back move of engine together with move of user
+            self.undo()
 
-    def draw_pawn_promotion(self):
-        """Draw pieces to choose
+    def redo(self):
+        """make again last move taken back with undo
         :return:
         """
-        if self.selected:
-            self.to_promote = [copy.deepcopy(self.selected), {}]
-            if self.to_promote[0].piece_type == "pawn" and self.to_promote[0].row == 7 or self.to_promote[0].row == 0:
-                if self.to_promote[0].color == "black":
-                    stop = self.to_promote[0].row - 4
-                    step = -1
-                else:
-                    stop = self.to_promote[0].row + 4
-                    step = 1
-                types = ["queen", "rook", "knight", "bishop"]
-
-                for row, piece_type in zip(range(self.to_promote[0].row, stop, step), types):
-                    self.to_promote[1].fromkeys(range(self.to_promote[0].row, stop, step))
-                    pygame.draw.rect(self.win, (125, 125, 125),
-                                     (
-                                     self.to_promote[0].col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-                    x = SQUARE_SIZE * self.to_promote[
-                        0].col + SQUARE_SIZE * 0.33 // 2  # center of square, cuz 1 - 0.67 in scale == 0.33
-                    y = SQUARE_SIZE * row
-                    piece_img = pygame.image.load(f'assets/pieces/{self.to_promote[0].color}_{piece_type}.png')
-                    piece_img = pygame.transform.scale(piece_img, (SQUARE_SIZE * 0.67, SQUARE_SIZE))
-                    self.win.blit(piece_img, (x, y))
-                    self.to_promote[1][row] = piece_type
-
-    def draw_check(self):
-        """display check
-        :return:
-        """
-        font = pygame.font.Font("assets/8bit.ttf", 80)
-        text = font.render('CHECK', True, (0, 0, 0))
-        text_check = text.get_rect(center=(WIDTH//2, HEIGHT//2 - 50))
-        self.win.blit(text, text_check)
-
-    def draw_checkmate(self):
-        """display checkmate and reset
-        :return:
-        """
-        font = pygame.font.Font("assets/8bit.ttf", 80)
-        font_restart = pygame.font.Font("assets/8bit.ttf", 40)
-        text = font.render(f'{self.board.winner} WINS', True, (0, 0, 0))
-        text_check = text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50))
-        text_r = font_restart.render('PRESS R TO RESTART', True, (0, 0, 0))
-        text_restart = text_r.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 50))
-        self.win.blit(text, text_check)
-        self.win.blit(text_r, text_restart)
+        if not self.redo_stack:
+            return
+        piece, square, promotion = self.redo_stack.pop()
+        start = piece.square
+        if self.board.move(piece, square, promotion):  # promotion wasn't chosen before undo
+            self.selected = piece
+            self.pawn_promotion = True
+            self.set_promotion()
+        else:
+            self._record(start, square, promotion)
+        self._after_takeback()
+        if self.engine_turn() and self.redo_stack:
+            self.redo()
 
-    def is_check(self):
-        """function is used after every move, it changes booleans of check and checkmate
+    def _record(self, start, square, promotion):
+        """Write move to log
+        :param start:
+        :param square:
+        :param promotion:
+        """
+        if self.log:
+            self.log.move(start, square, promotion)
+
+    def _after_takeback(self):
+        """update turn, status and whole window after undo or redo
+        :return:
+        """
+        self.selected = None
+        self.change_turn()
+        self.board.checkmate_bool = False
+        self.board.draw_bool = False
+        self.board.draw_reason = None
+        self.is_check()
+        self.renderer.mark_all()
+
+    def engine_turn(self):
+        """Check if engine should move now, game isn't over and user doesn't choose promoted piece
+        :return:
+        """
+        return self.turn == self.engine_color and not self.pawn_promotion and \
+            not self.board.checkmate_bool and not self.board.draw_bool
+
+    def think(self):
+        """Start search when engine is on move and make its move, when search is done, called every frame,
+        result of every iteration is shown in caption
+        :return:
+        """
+        if not self.engine_turn():
+            return
+        if not self.thinking:
+            self.engine.start(self.board, self.turn)
+            self.thinking = True
+        for kind, info in self.engine.poll():
+            if info.get("book"):
+                pygame.display.set_caption("pygame_chess - book move")
+            elif info.get("tablebase"):
+                result = "mate" if info["score"] > 0 else "mated" if info["score"] < 0 else "draw"
+                moves = f" in {(info['plies'] + 1) // 2}" if info["score"] else ""
+                pygame.display.set_caption(f"pygame_chess - tablebase, {result}{moves}")
+            elif "depth" in info:
+                pygame.display.set_caption(f"pygame_chess - depth {info['depth']}, score {info['score'] / 100:+.2f}, "
+                                           f"{info['nodes']} nodes, {info['nps']} nodes/s")
+            if kind == DONE and info["move"] is not None:
+                self.engine_move(info["move"])
+
+    def engine_move(self, move):
+        """Make move of engine like user would
+        :param move: (start, square, promotion)
         :return:
         """
-        checked_color = self.turn
-        check = self.board.get_status(checked_color)
+        start, square, promotion = move
+        self.selected = self.board.board[start]
+        self.valid_moves = self.board.legal_move_map(self.turn).get(start, {})
+        self._move(square, promotion)
+        self.selected = None
+
+    def get_book_moves(self, piece):
+        """Squares where piece can go by opening book
+        :param piece:
+        :return:
+        """
+        if self.book is None:
+            return set()
+        return {square for (start, square, _), _ in self.book.moves(self.board, self.turn) if start == piece.square}
 
-        self.board.status_of_game = check
-        if check["check"]["king_piece"] == 0:
+    def is_check(self):
+        """function is used after every move, it changes booleans of check, checkmate and draw,
+        legal moves of side to move are computed here once, selection of piece only reads them,
+        game isn't ended while pawn waits for promotion, it is checked again after piece is chosen,
+        only side to move can be in check, so full status of board isn't needed
+        :return:
+        """
+        if not self.pawn_promotion:
+            self.board.termination(self.turn)
+        if not self.board.in_check(self.turn):
             self.board.check_bool = False
             self.check = None
             self.display_check = False
         else:
-            self.board.checkmate(self.turn)
-            self.check = check
+            self.check = self.turn
             self.display_check = True
             self.board.check_bool = True
+            pygame.time.set_timer(CHECK_EXPIRED, CHECK_DISPLAY_TIME, 1)  # replaces timer of previous check
+
+    def hide_check(self):
+        """Hide CHECK text, called on CHECK_EXPIRED event
+        :return:
+        """
+        self.display_check = False
+
+    def set_promotion(self):
+        """Prepare pieces to choose after pawn reached last row, they are placed in column of pawn
+        :return:
+        """
+        pawn = self.selected
+        step = -COLS if pawn.color == Color.BLACK else COLS
+        self.to_promote = [pawn, {pawn.square + step * i: piece_type for i, piece_type in enumerate(PROMOTION_TYPES)}]
+        self.renderer.mark(*self.to_promote[1])
 
     def change_turn(self):
-        """change color, also reset valid_moves
+        """change color, also reset valid_moves and cancel search of engine
         :return:
         """
+        if self.thinking:
+            self.engine.cancel()
+            self.thinking = False
+        self.renderer.mark(*self.valid_moves)
         self.valid_moves = {}
-        if self.turn == "black":
-            self.turn = "white"
-        else:
-            self.turn = "black"
+        self.book_moves = set()
+        self.turn = Color(self.turn ^ 1)
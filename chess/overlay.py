@@ -0,0 +1,121 @@
+import pygame
+from chess.assets import atlas, PIECE_SCALE
+from chess.board import STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVES, REPETITION
+from chess.constants import SQUARE_SIZE, WIDTH, HEIGHT, PROMOTION_TYPES, Color
+
+FONT_PATH = "assets/8bit.ttf"
+TEXT_COLOR = (0, 0, 0)
+HUD_COLOR = (255, 255, 255)
+HUD_BACKGROUND = (0, 0, 0)
+HUD_SIZE = 16  # font size of profiling stats
+PICKER_COLOR = (125, 125, 125)  # background of pieces to choose in pawn promotion
+DRAW_REASONS = (STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVES, REPETITION)
+
+
+class Overlays:
+    def __init__(self):
+        """
+        fonts are loaded fonts keyed by size
+        texts are rendered (surface, rect) keyed by (text, size, center)
+        strips are pieces to choose in pawn promotion keyed by (color, size), ordered like PROMOTION_TYPES
+        """
+        self.fonts = {}
+        self.texts = {}
+        self.strips = {}
+
+    def load(self):
+        """Load font and render every text and promotion strip, which doesn't depend on game,
+        display mode has to be set before
+        """
+        self.check()
+        for reason in DRAW_REASONS:
+            self.draw(reason)
+        for color in Color:
+            self.promotion_strip(color)
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(FONT_PATH, size)
+        return self.fonts[size]
+
+    def text(self, text, size, center):
+        """Get rendered text and its rect, text is rendered only first time
+        :param text:
+        :param size:
+        :param center:
+        :return (surface, rect):
+        """
+        key = (text, size, center)
+        if key not in self.texts:
+            surface = self.font(size).render(text, True, TEXT_COLOR)
+            self.texts[key] = (surface, surface.get_rect(center=center))
+        return self.texts[key]
+
+    def restart(self):
+        return self.text('PRESS R TO RESTART', 40, (WIDTH // 2, HEIGHT // 2 + 50))
+
+    def check(self):
+        """Get blits of check text
+        :return list of (surface, rect):
+        """
+        return [self.text('CHECK', 80, (WIDTH // 2, HEIGHT // 2 - 50))]
+
+    def checkmate(self, winner):
+        """Get blits of checkmate text, only winner text can be rendered here
+        :param winner:
+        :return list of (surface, rect):
+        """
+        return [self.text(f'{winner.name.lower()} WINS', 80, (WIDTH // 2, HEIGHT // 2 - 50)), self.restart()]
+
+    def draw(self, reason):
+        """Get blits of draw text
+        :param reason: how game was drawn, one of DRAW_REASONS
+        :return list of (surface, rect):
+        """
+        return [self.text('DRAW', 80, (WIDTH // 2, HEIGHT // 2 - 50)),
+                self.text(reason.upper(), 30, (WIDTH // 2, HEIGHT // 2)), self.restart()]
+
+    def hud(self, lines):
+        """Get blits of profiling stats in top left corner, they change often, so they aren't cached
+        :param lines:
+        :return list of (surface, rect):
+        """
+        font = self.font(HUD_SIZE)
+        rendered = [font.render(line, True, HUD_COLOR) for line in lines]
+        surface = pygame.Surface((max(text.get_width() for text in rendered) + 8,
+                                  sum(text.get_height() for text in rendered) + 8)).convert()
+        surface.fill(HUD_BACKGROUND)
+        y = 4
+        for text in rendered:
+            surface.blit(text, (4, y))
+            y += text.get_height()
+        return [(surface, surface.get_rect(topleft=(0, 0)))]
+
+    def promotion_strip(self, color, size=SQUARE_SIZE):
+        """Get column of pieces to choose in pawn promotion, one square for every type from PROMOTION_TYPES
+        :param color:
+        :param size:
+        :return:
+        """
+        key = (color, size)
+        if key not in self.strips:
+            strip = pygame.Surface((size, size * len(PROMOTION_TYPES))).convert()
+            strip.fill(PICKER_COLOR)
+            for i, piece_type in enumerate(PROMOTION_TYPES):
+                x = size * (1 - PIECE_SCALE) // 2  # center of square
+                strip.blit(atlas.piece(color, piece_type, size), (x, size * i))
+            self.strips[key] = strip
+        return self.strips[key]
+
+    def blit_promotion(self, win, color, piece_type, rect):
+        """Blit one square of promotion strip
+        :param win:
+        :param color:
+        :param piece_type:
+        :param rect: square on board
+        """
+        index = PROMOTION_TYPES.index(piece_type)
+        win.blit(self.promotion_strip(color, rect.height), rect, (0, rect.height * index, rect.width, rect.height))
+
+
+overlays = Overlays()  # shared by renderer and main
@@ -0,0 +1,198 @@
+"""Parallel search, root moves are split between worker processes of a process pool.
+Workers get positions as compact encodings (chess.encoding), every worker keeps its own engine and
+transposition table between tasks. ParallelEngine is Engine with root search split between workers, tasks of
+stopped search stop too, so undo and restart don't leave cores busy.
+Run python -m chess.parallel to compare speed of worker counts.
+Speedup on more cores isn't verified, benchmark was run only on one core, where extra workers share it
+and search more nodes, 2 and 4 workers took 1.5x and 1.6x longer than 1 at depth 3
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from chess.board import Board
+from chess.encoding import decode, encode
+from chess.engine import Engine, SearchTimeout, INFINITY
+from chess.fen import load_position
+from chess.perft import BOARD_CLASSES, POSITIONS, move_name
+from chess.tablebase import Tablebase
+
+_engine = None  # engine of worker process
+_board_class = Board  # rules core of worker process
+_root_number = None  # number of root search shared with main process, tasks of older searches stop
+POLL_TIME = 0.05  # how often waiting search checks if it was stopped, in seconds
+
+
+def _start_worker(table_size, tablebase_directory, board_class, root_number):
+    global _engine, _board_class, _root_number
+    _board_class = board_class
+    _root_number = root_number
+    tablebase = Tablebase(tablebase_directory) if tablebase_directory else None  # files are mapped by every worker
+    _engine = Engine(table_size=table_size, tablebase=tablebase)
+
+
+def _search_move(data, move, depth, alpha, beta, movetime, number):
+    """Task of worker, search one root move of encoded position
+    :param data: encoded position
+    :param move: (start, square, promotion)
+    :param depth:
+    :param alpha:
+    :param beta:
+    :param movetime: ms left for search
+    :param number: number of root search, task stops when it changes
+    :return score or None when time ran out or search was stopped, nodes:
+    """
+    if _root_number.value != number:  # stopped before task started
+        return None, 0
+    board, color = decode(data, _board_class)
+    score = _engine.search_move(board, color, move, depth, alpha, beta, movetime,
+                                lambda: _root_number.value != number)
+    return score, _engine.nodes
+
+
+class ParallelEngine(Engine):
+    def __init__(self, workers=None, depth=None, movetime=None, table_size=1 << 18, book=None, tablebase=None,
+                 board_class=Board):
+        """
+        Engine, which searches root moves in worker processes, book, tablebase and iterative deepening are the same
+        every worker maps files of tablebase itself and keeps transposition table of table_size,
+        table of this process is used only with 1 worker, then search runs here like in plain Engine
+        board_class is rules core, which workers search with, Board or BitboardBoard
+        workers is number of processes, every core is used when none is given
+        every iteration searches best move of previous one first with full window,
+        other moves are searched at once with null window and the ones, which are better, again with full window
+        root_number is shared with workers, it changes after every root search, so its tasks stop at once
+        """
+        self.workers = workers or os.cpu_count() or 1
+        super().__init__(depth, movetime, table_size if self.workers == 1 else 1, book, tablebase)
+        self.table_size = table_size
+        self.board_class = board_class
+        self.pool = None
+        self.root_number = None
+
+    def close(self):
+        """Stop worker processes, pool is started again by next search
+        """
+        if self.pool is not None:
+            self.root_number.value += 1
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def _submit(self, data, move, depth, alpha, beta):
+        movetime = None
+        if self.deadline:
+            movetime = max(1, int((self.deadline - time.perf_counter()) * 1000))
+        return self.pool.submit(_search_move, data, move, depth, alpha, beta, movetime, self.root_number.value)
+
+    def _wait(self, futures):
+        """Wait until some task is finished
+        :param futures:
+        :return finished futures:
+        """
+        while True:
+            done, _ = wait(futures, POLL_TIME, FIRST_COMPLETED)
+            if done:
+                return done
+            if self.stopped is not None and self.stopped():
+                raise SearchTimeout
+
+    def _result(self, future):
+        """Score of task, nodes of worker are counted
+        :param future:
+        :return:
+        """
+        self._wait([future])
+        score, nodes = future.result()
+        self.nodes += nodes
+        if score is None:  # time ran out in worker
+            raise SearchTimeout
+        return score
+
+    def _root(self, moves, depth, color):
+        """Search every root move, first one with full window, other ones in parallel with null window,
+        tasks, which still run or wait when search ends or is stopped, are cancelled
+        :param moves:
+        :param depth:
+        :param color:
+        :return score, best move:
+        """
+        if self.workers == 1:
+            return super()._root(moves, depth, color)
+        if self.pool is None:
+            directory = self.tablebase.directory if self.tablebase else None
+            self.root_number = multiprocessing.Value("i", 0)
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_start_worker,
+                                            initargs=(self.table_size, directory, self.board_class, self.root_number))
+        data = encode(self.board, color)
+        keys = [self._move_key(move) for move in moves]
+        pending = {}
+        try:
+            alpha = self._result(self._submit(data, keys[0], depth, -INFINITY, INFINITY))
+            best = 0
+            window = alpha  # null window bound of pending searches, alpha can be raised while they run
+            pending = {self._submit(data, keys[index], depth, window, window + 1): index
+                       for index in range(1, len(keys))}
+            while pending:
+                for future in self._wait(pending):
+                    index = pending.pop(future)
+                    score = self._result(future)
+                    if score > window:  # move may be better, its exact score needs full window
+                        score = self._result(self._submit(data, keys[index], depth, alpha, INFINITY))
+                        if score > alpha:
+                            alpha, best = score, index
+        finally:
+            for future in pending:
+                future.cancel()
+            self.root_number.value += 1  # running tasks stop
+        return alpha, moves[best]
+
+
+BENCHMARK_POSITIONS = ("start", "kiwipete", "position6")  # positions of perft
+
+
+def benchmark(worker_counts, depth, board_class=Board):
+    """Search every benchmark position with every worker count, speedup is compared with the first count
+    :param worker_counts:
+    :param depth:
+    :param board_class:
+    :return dict of worker count: seconds:
+    """
+    times = {}
+    for workers in worker_counts:
+        engine = ParallelEngine(workers, depth, board_class=board_class)
+        seconds = 0
+        nodes = 0
+        for name in BENCHMARK_POSITIONS:
+            board, color = load_position(POSITIONS[name][0], board_class)
+            start = time.perf_counter()
+            piece, square, promotion = engine.search(board, color)
+            elapsed = time.perf_counter() - start
+            seconds += elapsed
+            nodes += engine.info["nodes"]
+            print(f"{workers:>2} workers  {name:10} {move_name(piece.square, square, promotion):6}"
+                  f"score {engine.info['score']:>6}  {engine.info['nodes']:>8} nodes  {elapsed:7.2f} s")
+        engine.close()
+        times[workers] = seconds
+        speedup = times[worker_counts[0]] / seconds if seconds else 0
+        print(f"{workers:>2} workers  total {nodes:>8} nodes  {seconds:7.2f} s  "
+              f"{nodes / seconds if seconds else 0:>8.0f} nodes/s  speedup {speedup:.2f}x")
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.parallel", description=__doc__)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to compare")
+    parser.add_argument("--board", default="board", choices=BOARD_CLASSES, help="rules core of workers")
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    print(f"{cores} cores")
+    if max(args.workers) > cores:
+        print(f"more workers than cores, speedup of {', '.join(str(n) for n in args.workers if n > cores)} "
+              f"workers isn't measured, only their overhead")
+    benchmark(args.workers, args.depth, BOARD_CLASSES[args.board])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Perft counts leaf nodes of move tree, it checks move generation and measures its speed,
+run it with python -m chess.perft, no window is opened
+"""
+import argparse
+import sys
+import time
+from chess.bitboard import BitboardBoard
+from chess.board import Board
+from chess.fen import load_position
+from chess.constants import COLS, ROWS, PieceType
+
+BOARD_CLASSES = {"board": Board, "bitboard": BitboardBoard}
+FILES = "abcdefgh"
+
+# expected counts of standard test positions, en passant isn't implemented, so its moves aren't counted,
+# counts which differ from published ones because of that are marked
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 {1: 48, 2: 2038, 3: 97766}),  # 2039, 97862 with en passant
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  {1: 14, 2: 191, 3: 2810, 4: 43087}),  # 2812, 43238 with en passant
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  {1: 6, 2: 264, 3: 9463}),  # 9467 with en passant
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  {1: 44, 2: 1486, 3: 62379}),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  {1: 46, 2: 2079, 3: 89890}),
+}
+
+
+def square_name(square):
+    row, col = divmod(square, COLS)
+    return f"{FILES[col]}{ROWS - row}"
+
+
+def move_name(start, square, promotion=None):
+    """Coordinate notation of move, like e2e4 or e7e8q
+    :param start:
+    :param square:
+    :param promotion:
+    :return:
+    """
+    name = square_name(start) + square_name(square)
+    if promotion:
+        name += "nbrq"[promotion - PieceType.KNIGHT]
+    return name
+
+
+def perft(board, color, depth):
+    """Count leaf nodes of move tree, moves on last level are only counted
+    :param board:
+    :param color: color on move
+    :param depth:
+    :return:
+    """
+    moves = board.generate_legal_moves(color)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for piece, square, promotion in moves:
+        board.move(piece, square, promotion)
+        nodes += perft(board, color ^ 1, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def divide(board, color, depth):
+    """Perft of every root move separately
+    :param board:
+    :param color:
+    :param depth:
+    :return dict of move name: nodes:
+    """
+    counts = {}
+    for piece, square, promotion in board.generate_legal_moves(color):
+        name = move_name(piece.square, square, promotion)
+        board.move(piece, square, promotion)
+        counts[name] = perft(board, color ^ 1, depth - 1)
+        board.unmake_move()
+    return counts
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def check(board_class, max_depth, min_nps=0):
+    """Compare perft of every stored position with expected counts, up to max_depth
+    :param board_class:
+    :param max_depth:
+    :param min_nps: slower positions are failed too
+    :return True if every count is right:
+    """
+    ok = True
+    for name, (fen, expected) in POSITIONS.items():
+        for depth, expected_nodes in expected.items():
+            if depth > max_depth:
+                continue
+            board, color = load_position(fen, board_class)
+            nodes, seconds = timed(perft, board, color, depth)
+            nps = nodes / seconds if seconds else float("inf")
+            verdict = "ok" if nodes == expected_nodes else f"FAIL expected {expected_nodes}"
+            if nodes == expected_nodes and nps < min_nps:
+                verdict = "SLOW"
+            ok &= verdict == "ok"
+            print(f"{name:10} depth {depth}  {nodes:>9} nodes  {seconds:8.3f} s  {nps:>10.0f} nodes/s  {verdict}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.perft", description=__doc__)
+    parser.add_argument("depth", type=int, nargs="?", default=3)
+    parser.add_argument("--position", default="start", choices=POSITIONS, help="stored test position")
+    parser.add_argument("--fen", help="position to count instead of stored one")
+    parser.add_argument("--board", default="board", choices=BOARD_CLASSES, help="move generator")
+    parser.add_argument("--divide", action="store_true", help="print nodes of every root move")
+    parser.add_argument("--check", action="store_true", help="compare stored positions up to depth")
+    parser.add_argument("--min-nps", type=float, default=0, help="with --check, fail slower positions")
+    args = parser.parse_args()
+    board_class = BOARD_CLASSES[args.board]
+
+    if args.check:
+        sys.exit(0 if check(board_class, args.depth, args.min_nps) else 1)
+
+    board, color = load_position(args.fen or POSITIONS[args.position][0], board_class)
+    if args.divide:
+        counts, seconds = timed(divide, board, color, args.depth)
+        for name, nodes in sorted(counts.items()):
+            print(f"{name}: {nodes}")
+        nodes = sum(counts.values())
+    else:
+        nodes, seconds = timed(perft, board, color, args.depth)
+    print(f"nodes {nodes}  time {seconds:.3f} s  {nodes / seconds if seconds else 0:.0f} nodes/s")
+
+
+if __name__ == '__main__':
+    main()
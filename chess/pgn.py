@@ -0,0 +1,218 @@
+"""Reading games from PGN files, games are read one by one, so big collections don't have to fit in memory.
+Check rules on recorded games with python -m chess.pgn games.pgn, every game is replayed on board in worker processes
+"""
+import argparse
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from chess.board import Board
+from chess.constants import COLS, ROWS, Color, PieceType, PAWN, KING
+from chess.fen import load_position
+from chess.perft import BOARD_CLASSES
+
+FILES = "abcdefgh"
+LETTERS = {"N": PieceType.KNIGHT, "B": PieceType.BISHOP, "R": PieceType.ROOK, "Q": PieceType.QUEEN, "K": KING}
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+HEADER = re.compile(r'\[(\w+)\s+"(.*)"\]')
+TOKEN = re.compile(r"\{[^}]*}|;[^\n]*|\$\d+|[()]|[^\s(){};]+")  # comment, NAG, variation, move or move number
+MOVE_NUMBER = re.compile(r"\d+\.+")
+SAN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?")
+CHUNK_SIZE = 64  # games sent to worker at once
+
+
+def parse_square(name):
+    """Square of name like e4
+    :param name:
+    :return:
+    """
+    return (ROWS - int(name[1])) * COLS + FILES.index(name[0])
+
+
+def read_games(lines):
+    """Read games one by one, text of game is kept only until it is parsed
+    :param lines: iterable of lines, like open file
+    :return generator of (headers, moves), moves are SAN of main line, comments and variations are skipped:
+    """
+    headers, movetext = {}, []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("["):
+            if movetext:  # moves of previous game are over
+                yield headers, san_moves("\n".join(movetext))
+                headers, movetext = {}, []
+            match = HEADER.match(line)
+            if match:
+                headers[match[1]] = match[2]
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+    if headers or movetext:
+        yield headers, san_moves("\n".join(movetext))
+
+
+def san_moves(movetext):
+    """Moves of main line in movetext of one game
+    :param movetext:
+    :return list of SAN:
+    """
+    moves = []
+    depth = 0  # variations can be nested
+    for token in TOKEN.findall(movetext):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth or token[0] in "{;$":
+            continue
+        elif token in RESULTS:
+            break
+        else:
+            token = MOVE_NUMBER.sub("", token, 1)  # move number can be glued to move, like 1.e4
+            if token:
+                moves.append(token)
+    return moves
+
+
+def parse_san(board, color, san):
+    """Find legal move written in SAN
+    :param board:
+    :param color: color on move
+    :param san: like Nbd7, exd5, e8=Q+ or O-O
+    :return (piece, square, promotion):
+    """
+    text = san.rstrip("+#!?")
+    moves = board.generate_legal_moves(color)
+    if text.replace("0", "O") in ("O-O", "O-O-O"):
+        step = 2 if len(text) == 3 else -2
+        candidates = [move for move in moves if move[0].piece_type == KING and move[1] - move[0].square == step]
+    else:
+        match = SAN.fullmatch(text)
+        if match is None:
+            raise ValueError(f"{san} isn't a move")
+        letter, file, rank, target, promotion = match.groups()
+        piece_type = LETTERS[letter] if letter else PAWN
+        square = parse_square(target)
+        promotion = LETTERS[promotion] if promotion else None
+        candidates = [(piece, to, promoted) for piece, to, promoted in moves
+                      if to == square and piece.piece_type == piece_type and promoted == promotion and
+                      (file is None or piece.col == FILES.index(file)) and
+                      (rank is None or piece.row == ROWS - int(rank))]
+    if len(candidates) != 1:
+        raise ValueError(f"{san} is {'ambiguous' if candidates else 'illegal'}")
+    return candidates[0]
+
+
+def replay(headers, moves, board_class=Board):
+    """Play moves of game on board, check and mate marks of moves are checked too
+    :param headers:
+    :param moves: SAN of main line
+    :param board_class:
+    :return number of played plies, error or None when whole game is legal:
+    """
+    try:
+        if "FEN" in headers:
+            board, color = load_position(headers["FEN"], board_class)
+        else:
+            board, color = board_class(), Color.WHITE
+    except ValueError as error:
+        return 0, f"bad FEN, {error}"
+    for ply, san in enumerate(moves):
+        number = f"{(board.start_ply + ply) // 2 + 1}{'.' if color == Color.WHITE else '...'}"
+        try:
+            piece, square, promotion = parse_san(board, color, san)
+        except ValueError as error:
+            return ply, f"{number} {error}"
+        board.move(piece, square, promotion)
+        color ^= 1
+        mark = san.rstrip("!?")[-1]
+        if mark in "+#" and not board.in_check(color):
+            return ply + 1, f"{number} {san} doesn't give check"
+        if mark == "#" and board.generate_legal_moves(color):
+            return ply + 1, f"{number} {san} isn't mate"
+    return len(moves), None
+
+
+def _replay_chunk(chunk, board_class):
+    """Replay games in worker
+    :param chunk: list of (number, headers, moves)
+    :param board_class:
+    :return list of (number, headers, plies, error):
+    """
+    return [(number, headers, *replay(headers, moves, board_class)) for number, headers, moves in chunk]
+
+
+def _chunks(games, size):
+    """Group numbered games to lists of size
+    :param games:
+    :param size:
+    :return generator of lists of (number, headers, moves):
+    """
+    chunk = []
+    for number, (headers, moves) in enumerate(games, 1):
+        chunk.append((number, headers, moves))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate(games, workers=None, chunk_size=CHUNK_SIZE, board_class=Board):
+    """Replay games in worker processes, only few chunks are waiting at once, so memory doesn't grow with games
+    :param games: iterable of (headers, moves), like read_games
+    :param workers: number of processes, every core is used when none is given
+    :param chunk_size: games sent to worker at once
+    :param board_class:
+    :return generator of (number, headers, plies, error) in order of games:
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in _chunks(games, chunk_size):
+            yield from _replay_chunk(chunk, board_class)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in _chunks(games, chunk_size):
+            pending.append(pool.submit(_replay_chunk, chunk, board_class))
+            if len(pending) > 2 * workers:  # workers have enough work, wait for the oldest chunk
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def read_files(paths):
+    """Games of every file one after another
+    :param paths:
+    :return generator of (headers, moves):
+    """
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            yield from read_games(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.pgn", description=__doc__)
+    parser.add_argument("pgn", nargs="+", help="files with games")
+    parser.add_argument("--workers", type=int, help="number of processes, every core by default")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="games sent to worker at once")
+    parser.add_argument("--board", choices=BOARD_CLASSES, default="board", help="rules core to check")
+    parser.add_argument("--errors", action="store_true", help="print only games with illegal moves")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    games = plies = failed = 0
+    for number, headers, played, error in validate(read_files(args.pgn), args.workers, args.chunk,
+                                                    BOARD_CLASSES[args.board]):
+        games += 1
+        plies += played
+        failed += error is not None
+        if error or not args.errors:
+            players = f"{headers.get('White', '?')} - {headers.get('Black', '?')}"
+            print(f"{number:>7}  {players[:40]:40}  {played:>4} plies  {error or 'ok'}")
+    elapsed = time.perf_counter() - start
+    print(f"{games} games  {failed} with errors  {plies} plies  {elapsed:.2f} s  "
+          f"{games / elapsed:.0f} games/s  {plies / elapsed:.0f} moves/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,43 @@
-import pygame
-from chess.constants import SQUARE_SIZE
+from chess.constants import COLS, Color, PieceType
 
 
 class Piece:
-    def __init__(self, row, col, color, piece_type):
-        self.row = row
-        self.col = col
+    __slots__ = ("square", "color", "piece_type", "moves")
+
+    def __init__(self, square, color, piece_type):
+        """
+        square is 0..63, color is Color and piece_type is PieceType,
+        pixel position is computed by renderer
+        """
+        self.square = square
         self.color = color
         self.piece_type = piece_type
         self.moves = 0
 
-        self.x = 0
-        self.y = 0
-        self.calc_pos()
+    @property
+    def row(self):
+        return self.square // COLS
 
-    def calc_pos(self):
-        """Calculate position of piece
-        piece_img x is scaled so, it has to be centered
-        piece_img y no need to center, it takes full height of SQUARE_SIZE
+    @property
+    def col(self):
+        return self.square % COLS
+
+    @property
+    def code(self):
+        """Small int of piece, color in bit 3 and type in bits 0-2, 0 is empty square
         :return:
         """
-        self.x = SQUARE_SIZE * self.col + SQUARE_SIZE * 0.33 // 2  # center of square, cuz 1 - 0.67 in scale == 0.33
-        self.y = SQUARE_SIZE * self.row
+        return self.color << 3 | self.piece_type
 
     def pawn_promotion(self):
-        self.piece_type = "queen"
+        self.piece_type = PieceType.QUEEN
 
-    def draw_piece(self, win):
-        """Draw piece on x and y using scaled image, takes color and piece type
-        :param win:
-        :return:
-        """
-        piece_img = pygame.image.load(f'assets/pieces/{self.color}_{self.piece_type}.png')
-        piece_img = pygame.transform.scale(piece_img, (SQUARE_SIZE * 0.67, SQUARE_SIZE))
-        win.blit(piece_img, (self.x, self.y))
-
-    def move(self, row, col):
-        """Move piece to given row, and col then calculate x and y
-        :param row:
-        :param col:
+    def move(self, square):
+        """Move piece to given square
+        :param square:
         :return:
         """
-        self.row = row
-        self.col = col
-        self.calc_pos()
+        self.square = square
 
     def __repr__(self):
-        return f"{self.color}_{self.piece_type}({self.row}, {self.col})"
+        return f"{Color(self.color).name.lower()}_{PieceType(self.piece_type).name.lower()}({self.row}, {self.col})"
@@ -0,0 +1,274 @@
+"""Named timers and counters of running game, turned on with CHESS_PROFILE=1 or F3 key.
+Methods of game, board, renderer and asset loading are wrapped only while profiling is on, so it costs nothing when
+it is off. Stats of session are dumped to JSON, merge stats of many sessions with python -m chess.profiling *.json
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import platform
+import sys
+import time
+from collections import deque
+
+ENV_VAR = "CHESS_PROFILE"
+STATS_DIR = "profiles"
+RECENT_FRAMES = 300  # frames used for frame time percentiles of overlay
+OVERLAY_INTERVAL = 0.5  # seconds between updates of overlay text
+BUCKETS_PER_DECADE = 10  # histogram of durations, bucket i holds durations up to 10 ** (i / 10) us
+BUCKETS = 8 * BUCKETS_PER_DECADE  # 1 us .. 100 s
+MOVE_GENERATION = ("get_valid_moves", "generate_moves", "legal_move_map")  # methods counted as move generation
+
+
+def _targets():
+    """Methods, which are timed, imported only when profiling is turned on
+    :return list of (owner, name):
+    """
+    import pygame
+    from chess.assets import Atlas
+    from chess.bitboard import BitboardBoard
+    from chess.board import Board
+    from chess.game import Game
+    from chess.overlay import Overlays
+    from chess.renderer import Renderer
+    targets = [(Game, "update"), (Game, "select"), (Game, "_move"), (Game, "_record"),
+               (Renderer, "render"), (Renderer, "draw_square"), (Renderer, "build_background"),
+               (Renderer, "draw_squares"), (Atlas, "resize"), (Overlays, "load"), (pygame.display, "update")]
+    for board_class in (Board, BitboardBoard):  # methods overridden by bitboard are timed separately
+        for name in ("get_status", "get_valid_moves", "generate_moves", "legal_move_map"):
+            if name in vars(board_class):
+                targets.append((board_class, name))
+    return targets
+
+
+def _bucket(seconds):
+    if seconds <= 1e-6:
+        return 0
+    return min(int(math.log10(seconds * 1e6) * BUCKETS_PER_DECADE) + 1, BUCKETS - 1)
+
+
+def _percentile(histogram, fraction):
+    """Upper bound of bucket, where fraction of durations is reached
+    :param histogram:
+    :param fraction:
+    :return seconds:
+    """
+    needed = fraction * sum(histogram)
+    seen = 0
+    for i, count in enumerate(histogram):
+        seen += count
+        if count and seen >= needed:
+            return 10 ** (i / BUCKETS_PER_DECADE) / 1e6
+    return 0.0
+
+
+class Timer:
+    def __init__(self):
+        """
+        total and max are in seconds, histogram counts durations in logarithmic buckets,
+        so timers of many sessions can be merged and percentiles still computed
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[_bucket(seconds)] += 1
+
+    def merge(self, stats):
+        """Add timer dumped by as_dict
+        :param stats:
+        """
+        self.count += stats["count"]
+        self.total += stats["total_ms"] / 1000
+        self.max = max(self.max, stats["max_ms"] / 1000)
+        self.histogram = [a + b for a, b in zip(self.histogram, stats["histogram"])]
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / self.count if self.count else 0.0,
+            "p50_ms": min(_percentile(self.histogram, 0.5), self.max) * 1000,
+            "p99_ms": min(_percentile(self.histogram, 0.99), self.max) * 1000,
+            "max_ms": self.max * 1000,
+            "histogram": self.histogram,
+        }
+
+
+class Profiler:
+    def __init__(self):
+        """
+        timers are keyed by name like Game.select, counters are plain numbers keyed by name
+        originals are (owner, name, attribute) of wrapped methods, they are put back when profiling is turned off
+        frames are durations of recent frames, frame_ends are times of their ends for FPS
+        """
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+        self.originals = []
+        self.frames = deque(maxlen=RECENT_FRAMES)
+        self.frame_ends = deque(maxlen=RECENT_FRAMES)
+        self.frame_start = None
+        self.overlay_time = 0.0
+        self.started = time.time()
+
+    def timer(self, name):
+        if name not in self.timers:
+            self.timers[name] = Timer()
+        return self.timers[name]
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def enable(self):
+        """Wrap every target with timer
+        """
+        if self.enabled:
+            return
+        for owner, name in _targets():
+            attribute = vars(owner)[name]
+            func = attribute.__func__ if isinstance(attribute, staticmethod) else attribute
+            wrapper = self._wrap(func, f"{owner.__name__.split('.')[-1]}.{name}")  # pygame.display is display
+            setattr(owner, name, staticmethod(wrapper) if isinstance(attribute, staticmethod) else wrapper)
+            self.originals.append((owner, name, attribute))
+        self.enabled = True
+
+    def disable(self):
+        """Put original methods back, collected stats are kept
+        """
+        for owner, name, attribute in reversed(self.originals):
+            setattr(owner, name, attribute)
+        self.originals = []
+        self.enabled = False
+        self.frame_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def _wrap(self, func, name):
+        timer = self.timer(name)
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(time.perf_counter() - start)
+        return timed
+
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self, game, events=0):
+        """Time work done in frame, sleeping between frames isn't counted, overlay text is refreshed sometimes
+        :param game:
+        :param events: number of events handled in frame
+        """
+        if self.frame_start is None:
+            if not self.enabled:
+                game.renderer.set_hud(None)
+            return
+        end = time.perf_counter()
+        self.frames.append(end - self.frame_start)
+        self.frame_ends.append(end)
+        self.timer("frame").add(end - self.frame_start)
+        self.count("events", events)
+        self.frame_start = None
+        if end - self.overlay_time > OVERLAY_INTERVAL:
+            self.overlay_time = end
+            game.renderer.set_hud(self.overlay_lines())
+
+    def moves(self):
+        """Number of moves made in game, every made move is recorded once, Game._move is called for every click
+        :return:
+        """
+        return self.timers["Game._record"].count if "Game._record" in self.timers else 0
+
+    def overlay_lines(self):
+        """Text of overlay, FPS and frame time of recent frames and move generation calls per move
+        :return:
+        """
+        frames = sorted(self.frames)
+        ends = [end for end in self.frame_ends if end > self.frame_ends[-1] - 1]
+        generation = sum(timer.count for name, timer in self.timers.items() if name.split(".")[-1] in MOVE_GENERATION)
+        return [
+            f"FPS {len(ends)}",
+            f"FRAME P50 {frames[len(frames) // 2] * 1e6:.0f} US",  # font has no dot
+            f"FRAME P99 {frames[int(len(frames) * 0.99)] * 1e6:.0f} US",
+            f"MOVEGEN {generation / max(self.moves(), 1):.0f} PER MOVE",
+        ]
+
+    def stats(self):
+        """Stats of session, which can be merged with stats of other sessions
+        :return dict:
+        """
+        return {
+            "session": {
+                "start": self.started,
+                "end": time.time(),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "pygame": sys.modules["pygame"].version.ver if "pygame" in sys.modules else None,
+            },
+            "timers": {name: timer.as_dict() for name, timer in sorted(self.timers.items())},
+            "counters": dict(self.counters, moves=self.moves()),
+        }
+
+    def dump(self, directory=STATS_DIR):
+        """Write stats of session to new JSON file
+        :param directory:
+        :return path of file:
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.json")
+        with open(path, "w") as file:
+            json.dump(self.stats(), file, indent=1)
+        return path
+
+
+profiler = Profiler()  # shared by main and wrapped methods
+
+
+def merge(paths):
+    """Merge stats of sessions
+    :param paths: JSON files written by dump
+    :return timers, counters, number of sessions:
+    """
+    timers = {}
+    counters = {}
+    for path in paths:
+        with open(path) as file:
+            stats = json.load(file)
+        for name, timer in stats["timers"].items():
+            timers.setdefault(name, Timer()).merge(timer)
+        for name, value in stats["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+    return timers, counters, len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.profiling", description=__doc__)
+    parser.add_argument("stats", nargs="+", help="JSON files of sessions")
+    args = parser.parse_args()
+    timers, counters, sessions = merge(args.stats)
+    print(f"{sessions} sessions  " + "  ".join(f"{name} {value}" for name, value in sorted(counters.items())))
+    print(f"{'timer':32} {'count':>10} {'total ms':>12} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, timer in sorted(timers.items(), key=lambda item: -item[1].total):
+        stats = timer.as_dict()
+        print(f"{name:32} {stats['count']:>10} {stats['total_ms']:>12.1f} {stats['mean_ms']:>10.3f} "
+              f"{stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f} {stats['max_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Binary records of played games, every move is 2 bytes, so thousands of games fit in few hundred KB.
+Game writes moves to log of session as they are made, logs are mapped to memory and games are rebuilt from them.
+Show games of logs with python -m chess.record logs/*.games
+
+File starts with MAGIC and version, then there are 16 bit little endian words:
+move is start | square << 6 | promotion << 12 (promotion 0 when pawn isn't promoted),
+GAME_START is followed by HEADER and FEN padded to even length (empty FEN is starting position),
+TAKEBACK removes last move of game, GAME_END | result closes game, game without end wasn't finished
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from chess.board import Board
+from chess.constants import Color, PieceType
+from chess.fen import STARTING_FEN, dump_position, load_position
+
+MAGIC = b"PCGR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")  # magic, version, unused
+HEADER = struct.Struct("<IH")  # unix time of first move, length of FEN
+GAME_START = 0xF000  # words with high bit set are control words, moves use 15 bits
+TAKEBACK = 0xF100
+GAME_END = 0xF200  # low byte is result
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")  # index is result code
+LOG_DIR = "logs"
+BUFFER_SIZE = 1 << 16  # bytes written at once, log is flushed after every game too
+
+
+def encode_move(start, square, promotion=None):
+    """16 bit code of move
+    :param start:
+    :param square:
+    :param promotion: piece type or None
+    :return:
+    """
+    return start | square << 6 | (promotion or 0) << 12
+
+
+def decode_move(code):
+    """Move of 16 bit code
+    :param code:
+    :return (start, square, promotion):
+    """
+    return code & 63, code >> 6 & 63, PieceType(code >> 12) if code >> 12 else None
+
+
+class GameLog:
+    def __init__(self, directory=LOG_DIR, path=None):
+        """
+        log of one session, new file is created in directory, unless path of existing log is given
+        game is written when its first move is made, so games without moves leave no trace
+        """
+        if path is None:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.games")
+        self.path = path
+        self.file = open(path, "ab", buffering=BUFFER_SIZE)
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self.fen = b""  # starting position of next game
+        self.open = False  # started game has moves in log
+
+    def start(self, fen=None):
+        """Start new game, game which was started before and has no moves is forgotten
+        :param fen: starting position, None for normal start
+        """
+        if self.open:
+            self.end()
+        self.fen = fen.encode() if fen and fen != STARTING_FEN else b""
+
+    def move(self, start, square, promotion=None):
+        """Append move to game
+        :param start:
+        :param square:
+        :param promotion:
+        """
+        if not self.open:
+            self.file.write(struct.pack("<H", GAME_START) + HEADER.pack(int(time.time()), len(self.fen)) +
+                            self.fen + b"\0" * (len(self.fen) % 2))
+            self.open = True
+        self.file.write(struct.pack("<H", encode_move(start, square, promotion)))
+
+    def takeback(self):
+        """Remove last move of game
+        """
+        if self.open:
+            self.file.write(struct.pack("<H", TAKEBACK))
+
+    def end(self, result="*"):
+        """Close game and flush log, game which has no moves isn't written
+        :param result: one of RESULTS
+        """
+        if self.open:
+            self.file.write(struct.pack("<H", GAME_END | RESULTS.index(result)))
+            self.file.flush()
+        self.open = False
+        self.fen = b""
+
+    def close(self):
+        self.end()
+        self.file.close()
+
+
+class GameArchive:
+    def __init__(self, path):
+        """
+        log mapped to memory, it is read only, games is index of (time, fen, first word, end word, result)
+        moves of game are words between first and end word
+        """
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            raise ValueError(f"{path} isn't a game log")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            self.file.close()
+            raise ValueError(f"{path} isn't a game log of version {VERSION}")
+        length = (size - FILE_HEADER.size) // 2
+        if sys.byteorder == "little":
+            self.words = memoryview(self.data)[FILE_HEADER.size:FILE_HEADER.size + length * 2].cast("H")
+        else:
+            self.words = array("H", self.data[FILE_HEADER.size:FILE_HEADER.size + length * 2])
+            self.words.byteswap()
+        self.games = self._index()
+
+    def _index(self):
+        """Find games in log, game cut by crash ends at end of file
+        :return:
+        """
+        games = []
+        words = self.words
+        i = 0
+        while i < len(words):
+            if words[i] != GAME_START:  # moves of game are skipped by its end search
+                i += 1
+                continue
+            offset = FILE_HEADER.size + (i + 1) * 2
+            if offset + HEADER.size > len(self.data):
+                break
+            timestamp, fen_length = HEADER.unpack_from(self.data, offset)
+            fen = bytes(self.data[offset + HEADER.size:offset + HEADER.size + fen_length]).decode()
+            first = i + 1 + (HEADER.size + fen_length + 1) // 2
+            end = first
+            while end < len(words) and (words[end] < GAME_START or words[end] == TAKEBACK):
+                end += 1
+            result = words[end] & 0xFF if end < len(words) and words[end] >> 8 == GAME_END >> 8 else 0
+            games.append((timestamp, fen or STARTING_FEN, first, end, RESULTS[result]))
+            i = end
+        return games
+
+    def __len__(self):
+        return len(self.games)
+
+    def headers(self, number):
+        """Information about game
+        :param number: index of game in log
+        :return dict of time, fen, result and plies:
+        """
+        timestamp, fen, _, _, result = self.games[number]
+        return {"time": timestamp, "fen": fen, "result": result, "plies": len(self.moves(number))}
+
+    def moves(self, number):
+        """Moves of game, moves which were taken back are left out
+        :param number: index of game in log
+        :return list of (start, square, promotion):
+        """
+        _, _, first, end, _ = self.games[number]
+        codes = []
+        for code in self.words[first:end]:
+            if code == TAKEBACK:
+                if codes:
+                    codes.pop()
+            else:
+                codes.append(code)
+        return [decode_move(code) for code in codes]
+
+    def position(self, number, ply=None, board_class=Board):
+        """Board of game after given number of plies
+        :param number: index of game in log
+        :param ply: None for last position
+        :param board_class:
+        :return board, color on move:
+        """
+        _, fen, _, _, _ = self.games[number]
+        board, color = load_position(fen, board_class)
+        for start, square, promotion in self.moves(number)[:ply]:
+            board.move(board.board[start], square, promotion)
+            color = Color(color ^ 1)
+        return board, color
+
+    def close(self):
+        if isinstance(self.words, memoryview):
+            self.words.release()
+        self.data.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.record", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="game logs")
+    parser.add_argument("--game", type=int, help="print FEN of every ply of game with this number")
+    args = parser.parse_args()
+    for path in args.logs:
+        start = time.perf_counter()
+        archive = GameArchive(path)
+        indexed = time.perf_counter() - start
+        if args.game is not None:
+            board, color = load_position(archive.games[args.game][1])
+            print(dump_position(board, color))
+            for piece_square, square, promotion in archive.moves(args.game):
+                board.move(board.board[piece_square], square, promotion)
+                color = Color(color ^ 1)
+                print(dump_position(board, color))
+        else:
+            for number in range(len(archive)):
+                headers = archive.headers(number)
+                print(f"{number:>6}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(headers['time']))}  "
+                      f"{headers['result']:7}  {headers['plies']:>4} plies  {headers['fen']}")
+        start = time.perf_counter()
+        plies = sum(len(archive.position(number)[0].undo_stack) for number in range(len(archive)))
+        replayed = time.perf_counter() - start
+        print(f"{path}  {len(archive)} games  {os.path.getsize(path)} bytes  indexed in {indexed * 1000:.1f} ms  "
+              f"{plies} plies replayed in {replayed:.2f} s")
+        archive.close()
+
+
+if __name__ == '__main__':
+    main()
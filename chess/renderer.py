@@ -0,0 +1,172 @@
+import pygame
+from chess.assets import atlas, PIECE_SCALE
+from chess.constants import WHITE, ROWS, COLS, SQUARES, SQUARE_SIZE
+from chess.overlay import overlays
+
+HINT_COLOR = (125, 125, 125)  # color of move hints
+BOOK_HINT_COLOR = (70, 130, 180)  # color of hints of moves from opening book
+
+
+class Renderer:
+    def __init__(self, win):
+        """
+        background is cached surface with squares of board, pieces are drawn on top of it
+        dirty are squares, which have to be redrawn in next frame
+        overlay is key of text displayed on board (check, checkmate), overlay_blits are its (surface, rect)
+        hud_blits are (surface, rect) of profiling stats in corner of window
+        """
+        self.win = win
+        self.background = None
+        self.dirty = set()
+        self.full_redraw = True
+        self.overlay = None
+        self.overlay_blits = []
+        self.hud_blits = []
+
+    def build_background(self):
+        """Draw squares of board once, on separate surface
+        """
+        self.background = pygame.Surface(self.win.get_size()).convert()
+        self.draw_squares(self.background)
+
+    @staticmethod
+    def draw_squares(win):
+        """ Draw squares of board, firstly white color generates on screen,
+        then makes every 2 square black squares from image
+        :param win:
+        :return:
+        """
+        win.fill(WHITE)
+        black_square = atlas.square(SQUARE_SIZE)
+        for row in range(ROWS):
+            for col in range(row % 2 - 1, ROWS, 2):
+                win.blit(black_square, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+
+    def mark(self, *squares):
+        """Mark squares to redraw in next frame
+        :param squares:
+        """
+        self.dirty.update(squares)
+
+    def mark_all(self):
+        """Redraw whole window in next frame, used after reset
+        """
+        self.full_redraw = True
+
+    def set_hud(self, lines):
+        """Show lines of text in corner of window, squares under old and new text are redrawn
+        :param lines: None hides text
+        """
+        if not lines and not self.hud_blits:
+            return
+        for _, rect in self.hud_blits:
+            self.mark_rect(rect)
+        self.hud_blits = overlays.hud(lines) if lines else []
+        for _, rect in self.hud_blits:
+            self.mark_rect(rect)
+
+    def mark_rect(self, rect):
+        """Mark every square, which is covered by rect
+        :param rect:
+        """
+        for row in range(max(rect.top // SQUARE_SIZE, 0), min((rect.bottom - 1) // SQUARE_SIZE, ROWS - 1) + 1):
+            for col in range(max(rect.left // SQUARE_SIZE, 0), min((rect.right - 1) // SQUARE_SIZE, COLS - 1) + 1):
+                self.dirty.add(row * COLS + col)
+
+    @staticmethod
+    def square_rect(square):
+        row, col = divmod(square, COLS)
+        return pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+    @staticmethod
+    def piece_position(square):
+        """Get pixel position of piece image, image is narrower than square, so it is centered horizontally,
+        it takes full height of square
+        :param square:
+        :return x, y:
+        """
+        row, col = divmod(square, COLS)
+        return SQUARE_SIZE * col + SQUARE_SIZE * (1 - PIECE_SCALE) // 2, SQUARE_SIZE * row
+
+    def render(self, game):
+        """Redraw only dirty squares and update only their part of display,
+        if nothing changed since last frame it does nothing
+        :param game:
+        :return:
+        """
+        overlay = self.overlay_key(game)
+        if overlay != self.overlay:  # banner appeared, disappeared or changed, redraw squares under old and new one
+            for surface, rect in self.overlay_blits:
+                self.mark_rect(rect)
+            self.overlay = overlay
+            self.overlay_blits = self.overlay_surfaces(game)
+            for surface, rect in self.overlay_blits:
+                self.mark_rect(rect)
+
+        if not self.full_redraw and not self.dirty:
+            return []
+        if self.background is None:
+            self.build_background()
+        if self.full_redraw:
+            self.dirty = set(range(SQUARES))
+
+        rects = []
+        for square in self.dirty:
+            rect = self.square_rect(square)
+            self.draw_square(game, square, rect)
+            self.win.set_clip(rect)  # text has to be blitted only on freshly restored squares, or antialiasing adds up
+            for surface, overlay_rect in self.overlay_blits + self.hud_blits:
+                if overlay_rect.colliderect(rect):
+                    self.win.blit(surface, overlay_rect)
+            self.win.set_clip(None)
+            rects.append(rect)
+
+        self.dirty = set()
+        if self.full_redraw:
+            self.full_redraw = False
+            rects = [self.win.get_rect()]
+        pygame.display.update(rects)
+        return rects
+
+    def draw_square(self, game, square, rect):
+        """Draw background, piece, move hint and promotion picker of one square
+        :param game:
+        :param square:
+        :param rect:
+        """
+        self.win.blit(self.background, rect, rect)
+        if game.pawn_promotion and square in game.to_promote[1]:
+            overlays.blit_promotion(self.win, game.to_promote[0].color, game.to_promote[1][square], rect)
+            return
+        piece = game.board.board[square]
+        if piece != 0:
+            self.win.blit(atlas.piece(piece.color, piece.piece_type, SQUARE_SIZE), self.piece_position(square))
+        if square in game.valid_moves:
+            pygame.draw.circle(self.win, BOOK_HINT_COLOR if square in game.book_moves else HINT_COLOR, rect.center, 15)
+
+    @staticmethod
+    def overlay_key(game):
+        """Get key of text, which should be displayed over the board, None if there is no text
+        :param game:
+        :return:
+        """
+        if game.board.checkmate_bool:
+            return "checkmate", game.board.winner
+        if game.board.draw_bool:
+            return "draw", game.board.draw_reason
+        if game.display_check:
+            return ("check",)
+        return None
+
+    def overlay_surfaces(self, game):
+        """Get cached text of current overlay, it is called only when overlay changes
+        :param game:
+        :return list of (surface, rect):
+        """
+        if self.overlay is None:
+            return []
+        if self.overlay[0] == "check":
+            return overlays.check()
+        if self.overlay[0] == "draw":
+            return overlays.draw(self.overlay[1])
+        return overlays.checkmate(game.board.winner)
@@ -0,0 +1,49 @@
+"""Startup time of rules core and of full game, every import is timed in fresh interpreter.
+Rules core (board, move generation, FEN, engine) doesn't import pygame, so tools and worker processes start fast,
+pygame, assets and renderer are imported only by game window. Run python -m chess.startup to compare them.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CORE = ("chess.board", "chess.bitboard", "chess.fen", "chess.engine", "chess.perft")
+UI = ("pygame", "pygame_menu", "chess.game", "chess.renderer", "chess.overlay")
+TOOLS = ("chess.pgn", "chess.record", "chess.parallel", "chess.book", "chess.tablebase", "chess.batch")
+
+
+def import_time(modules, repeat=5):
+    """Median wall time of python -c importing modules, python without imports is subtracted
+    :param modules:
+    :param repeat:
+    :return seconds, modules of pygame were imported:
+    """
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    code = "import sys\n" + "".join(f"import {module}\n" for module in modules) + "print('pygame' in sys.modules)"
+    times, base, outputs = [], [], set()
+    for _ in range(repeat):
+        for command, result in ((code, times), ("pass", base)):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", command], env=env, check=True,
+                                    capture_output=True, text=True)
+            result.append(time.perf_counter() - start)
+            outputs.add(output.stdout.strip())
+    return max(statistics.median(times) - statistics.median(base), 0.0), "True" in outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.startup", description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters started for every set of modules")
+    args = parser.parse_args()
+    core = None
+    for name, modules in (("core", CORE), ("core + tools", CORE + TOOLS), ("full game", CORE + UI)):
+        seconds, pygame = import_time(modules, args.repeat)
+        core = seconds if core is None else core  # first row is baseline of ratios
+        print(f"{name:14} {seconds * 1000:8.1f} ms  {seconds / max(core, 1e-6):5.1f}x core  "
+              f"pygame {'imported' if pygame else 'not imported'}")
+
+
+if __name__ == '__main__':
+    main()
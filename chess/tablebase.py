@@ -0,0 +1,451 @@
+"""Endgame tablebases of king with pieces against lone king (KQK, KRK, KPK, KBNK).
+Tables are made by retrograde analysis, from mates backwards, and saved as one byte of distance to mate per position,
+files are probed through mmap. Generate them with python -m chess.tablebase, KPK needs KQK and KRK.
+"""
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from chess.bitboard import BETWEEN, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS
+from chess.constants import COLS, ROWS, SQUARES, Color, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from chess.tables import BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS
+from chess.zobrist import castling_key
+
+TABLE_DIR = "assets/tablebases"
+TABLES = {  # pieces of strong side besides king, highest type first, tables used by other tables have to be first
+    "KQK": (QUEEN,),
+    "KRK": (ROOK,),
+    "KPK": (PAWN,),
+    "KBNK": (BISHOP, KNIGHT),
+}
+WIN, DRAW, LOSS = 1, 0, -1
+MAX_PIECES = 4
+CHUNK = 1 << 16  # positions in one task of generator
+BISHOP_LINES = [sum(1 << square for ray in rays for square in ray) for rays in BISHOP_RAYS]
+ROOK_LINES = [sum(1 << square for ray in rays for square in ray) for rays in ROOK_RAYS]
+SLIDER_RAYS = {BISHOP: BISHOP_RAYS, ROOK: ROOK_RAYS, QUEEN: QUEEN_RAYS}
+FIRST_ROW, LAST_ROW = 0, ROWS - 1
+
+# in table strong side is white and positions are mirrored, so white king is in left half of board with pawns,
+# or in left upper quarter without them, flips are xor of square
+PAWN_FLIPS = (0, COLS - 1)
+FLIPS = (0, COLS - 1, SQUARES - COLS, SQUARES - 1)
+
+
+class Table:
+    def __init__(self, name):
+        """
+        index of position is side to move (0 strong side, 1 weak side), white king, black king and pieces,
+        king_index is index of white king square, -1 outside of allowed part of board
+        value of position is 0 for draw or illegal position, else number of plies to mate + 1, strong side always wins
+        """
+        self.name = name
+        self.types = TABLES[name]
+        self.flips = PAWN_FLIPS if PAWN in self.types else FLIPS
+        king_squares = [square for square in range(SQUARES)
+                        if square % COLS < COLS // 2 and (PAWN in self.types or square // COLS < ROWS // 2)]
+        self.king_squares = tuple(king_squares)
+        self.king_index = [king_squares.index(square) if square in king_squares else -1 for square in range(SQUARES)]
+        self.flip_of = [next(flip for flip in self.flips if self.king_index[square ^ flip] >= 0)
+                        for square in range(SQUARES)]  # flip, which moves king to allowed part
+        self.half = len(king_squares) * SQUARES ** len(self.types) * SQUARES  # positions of one side to move
+        self.size = 2 * self.half
+
+    def index(self, side, white_king, black_king, pieces):
+        """Index of position, it is mirrored first
+        :param side: 0 when strong side is on move
+        :param white_king: square of king of strong side
+        :param black_king:
+        :param pieces: squares of pieces of strong side, in order of types
+        :return:
+        """
+        flip = self.flip_of[white_king]
+        index = side * len(self.king_squares) + self.king_index[white_king ^ flip]
+        index = index * SQUARES + (black_king ^ flip)
+        for square in pieces:
+            index = index * SQUARES + (square ^ flip)
+        return index
+
+    def position(self, index):
+        """Squares of position of index
+        :param index:
+        :return side, white king, black king, pieces:
+        """
+        pieces = []
+        for _ in self.types:
+            index, square = divmod(index, SQUARES)
+            pieces.append(square)
+        pieces.reverse()
+        index, black_king = divmod(index, SQUARES)
+        side, king = divmod(index, len(self.king_squares))
+        return side, self.king_squares[king], black_king, pieces
+
+
+def attacked(square, white_king, pieces, types, occupied):
+    """Check if square is attacked by strong side
+    :param square:
+    :param white_king:
+    :param pieces:
+    :param types:
+    :param occupied: mask of pieces, which block lines
+    :return:
+    """
+    if KING_ATTACKS[white_king] >> square & 1:
+        return True
+    for piece, piece_type in zip(pieces, types):
+        if piece_type == KNIGHT:
+            if KNIGHT_ATTACKS[piece] >> square & 1:
+                return True
+        elif piece_type == PAWN:
+            if PAWN_ATTACKS[Color.WHITE][piece] >> square & 1:
+                return True
+        else:
+            if piece_type != ROOK and BISHOP_LINES[piece] >> square & 1 and not BETWEEN[piece][square] & occupied:
+                return True
+            if piece_type != BISHOP and ROOK_LINES[piece] >> square & 1 and not BETWEEN[piece][square] & occupied:
+                return True
+    return False
+
+
+def legal(white_king, black_king, pieces, types):
+    """Check if pieces stand on different squares, kings aren't next to each other and pawns aren't on last rows
+    :return:
+    """
+    squares = {white_king, black_king, *pieces}
+    if len(squares) < 2 + len(pieces) or KING_ATTACKS[white_king] >> black_king & 1:
+        return False
+    return not any(piece_type == PAWN and piece // COLS in (FIRST_ROW, LAST_ROW)
+                   for piece, piece_type in zip(pieces, types))
+
+
+def _mask(squares):
+    mask = 0
+    for square in squares:
+        mask |= 1 << square
+    return mask
+
+
+def black_moves(white_king, black_king, pieces, types):
+    """Moves of lone king
+    :return number of moves, True if king can capture piece (it's draw then):
+    """
+    count = 0
+    occupied = _mask(pieces) | 1 << white_king  # king doesn't block line behind itself
+    for target in KING_ATTACKS_SQUARES[black_king]:
+        if target in pieces:
+            index = pieces.index(target)
+            others = pieces[:index] + pieces[index + 1:]
+            other_types = types[:index] + types[index + 1:]
+            if not attacked(target, white_king, others, other_types, occupied):
+                return count, True
+        elif not attacked(target, white_king, pieces, types, occupied):
+            count += 1
+    return count, False
+
+
+def _piece_targets(square, piece_type, occupied):
+    """Empty squares, which piece reaches from square, it's the same forwards and backwards, pawns excluded
+    :param square:
+    :param piece_type:
+    :param occupied:
+    :return:
+    """
+    if piece_type == KNIGHT:
+        return [target for target in KNIGHT_TARGETS_SQUARES[square] if not occupied >> target & 1]
+    if piece_type == KING:
+        return [target for target in KING_ATTACKS_SQUARES[square] if not occupied >> target & 1]
+    targets = []
+    for ray in SLIDER_RAYS[piece_type][square]:
+        for target in ray:
+            if occupied >> target & 1:
+                break
+            targets.append(target)
+    return targets
+
+
+def white_unmoves(table, white_king, black_king, pieces):
+    """Positions with strong side on move, from which it can get to position
+    :return list of indexes:
+    """
+    types = table.types
+    occupied = _mask(pieces) | 1 << white_king | 1 << black_king
+    indexes = []
+    for target in _piece_targets(white_king, KING, occupied):
+        if not KING_ATTACKS[target] >> black_king & 1 and \
+                not attacked(black_king, target, pieces, types, occupied ^ 1 << white_king | 1 << target):
+            indexes.append(table.index(0, target, black_king, pieces))
+    for i, (piece, piece_type) in enumerate(zip(pieces, types)):
+        if piece_type == PAWN:  # pawn goes back 1 square, or 2 from its 4th row
+            targets = []
+            if piece // COLS < LAST_ROW - 1 and not occupied >> (piece + COLS) & 1:
+                targets.append(piece + COLS)
+                if piece // COLS == LAST_ROW - 3 and not occupied >> (piece + 2 * COLS) & 1:
+                    targets.append(piece + 2 * COLS)
+        else:
+            targets = _piece_targets(piece, piece_type, occupied)
+        for target in targets:
+            moved = pieces[:i] + [target] + pieces[i + 1:]
+            if not attacked(black_king, white_king, moved, types, occupied ^ 1 << piece | 1 << target):
+                indexes.append(table.index(0, white_king, black_king, moved))
+    return indexes
+
+
+def black_unmoves(table, white_king, black_king, pieces):
+    """Positions with lone king on move, from which it can get to position
+    :return list of indexes:
+    """
+    occupied = _mask(pieces) | 1 << white_king
+    return [table.index(1, white_king, target, pieces) for target in _piece_targets(black_king, KING, occupied)
+            if not KING_ATTACKS[target] >> white_king & 1]
+
+
+KING_ATTACKS_SQUARES = [[square for square in range(SQUARES) if mask >> square & 1] for mask in KING_ATTACKS]
+KNIGHT_TARGETS_SQUARES = [[square for square in range(SQUARES) if mask >> square & 1] for mask in KNIGHT_ATTACKS]
+
+_tables = {}  # tables and opened tablebases of generator process
+
+
+def _table(name):
+    if name not in _tables:
+        _tables[name] = Table(name)
+    return _tables[name]
+
+
+def _tablebase(directory):
+    if directory not in _tables:
+        _tables[directory] = Tablebase(directory)
+    return _tables[directory]
+
+
+def _classify(name, directory, start, stop):
+    """Task of generator, first look at positions from start to stop
+    :return remaining moves of lone king (0 when it's draw or mate), mates,
+    (plies, index) of positions won by promotion:
+    """
+    table = _table(name)
+    types = table.types
+    remaining = bytearray(stop - start)
+    mates = []
+    promotions = []
+    for index in range(start, stop):
+        side, white_king, black_king, pieces = table.position(index)
+        if not legal(white_king, black_king, pieces, types):
+            continue
+        occupied = _mask(pieces) | 1 << white_king
+        check = attacked(black_king, white_king, pieces, types, occupied)
+        if side == 1:
+            count, capture = black_moves(white_king, black_king, pieces, types)
+            if not capture:
+                remaining[index - start] = count
+                if count == 0 and check:
+                    mates.append(index)
+        elif not check and PAWN in types:
+            i = types.index(PAWN)
+            pawn = pieces[i]
+            target = pawn - COLS
+            if pawn // COLS == FIRST_ROW + 1 and target != black_king and target != white_king:
+                best = None
+                for piece_type in (QUEEN, ROOK):
+                    moved = pieces[:i] + [target] + pieces[i + 1:]
+                    value = _tablebase(directory).value((KING, piece_type), 1, white_king, black_king, moved)
+                    if value and (best is None or value < best):
+                        best = value
+                if best is not None:
+                    promotions.append((best, index))  # mate in plies of promoted position + 1
+    return remaining, mates, promotions
+
+
+def _unmove(name, side, indexes):
+    """Task of generator, predecessors of positions
+    :param name:
+    :param side: side to move in positions
+    :param indexes:
+    :return:
+    """
+    table = _table(name)
+    unmoves = black_unmoves if side == 0 else white_unmoves
+    predecessors = []
+    for index in indexes:
+        _, white_king, black_king, pieces = table.position(index)
+        predecessors.extend(unmoves(table, white_king, black_king, pieces))
+    return predecessors
+
+
+def generate(name, directory=TABLE_DIR, workers=None):
+    """Create table and save it to directory
+    :param name: one of TABLES
+    :param directory:
+    :param workers: number of processes, every core is used when none is given
+    :return path of file, number of won positions, longest mate in plies:
+    """
+    table = Table(name)
+    if PAWN in table.types:
+        for needed in ("KQK", "KRK"):
+            if not os.path.exists(os.path.join(directory, f"{needed}.bin")):
+                raise FileNotFoundError(f"{name} needs {needed}, generate it first")
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    def run(func, *tasks):
+        if pool is None:
+            return [func(*task) for task in zip(*tasks)]
+        return list(pool.map(func, *tasks))
+
+    values = bytearray(table.size)
+    remaining = bytearray(table.size)
+    buckets = {}  # plies: positions, which may be mated in plies
+    starts = range(0, table.size, CHUNK)
+    results = run(_classify, [name] * len(starts), [directory] * len(starts), starts,
+                  [min(start + CHUNK, table.size) for start in starts])
+    for start, (chunk, mates, promotions) in zip(starts, results):
+        remaining[start:start + len(chunk)] = chunk
+        buckets.setdefault(0, []).extend(mates)
+        for plies, index in promotions:
+            buckets.setdefault(plies, []).append(index)
+
+    plies = 0
+    won = 0
+    longest = 0
+    while any(level >= plies for level in buckets):
+        side = plies % 2 ^ 1  # lone king is mated after even plies
+        resolved = []
+        for index in buckets.pop(plies, []):
+            if side == 1 or not values[index]:  # positions of lone king are resolved when they are added
+                values[index] = plies + 1
+                resolved.append(index)
+        won += len(resolved)
+        longest = plies if resolved else longest
+        if plies + 1 > 0xFE:
+            raise ValueError(f"mate in {plies} plies doesn't fit in table")
+        chunks = [resolved[i:i + CHUNK] for i in range(0, len(resolved), CHUNK)]
+        for predecessors in run(_unmove, [name] * len(chunks), [side] * len(chunks), chunks):
+            for index in predecessors:
+                if side == 1:
+                    if not values[index]:
+                        buckets.setdefault(plies + 1, []).append(index)
+                elif remaining[index]:
+                    remaining[index] -= 1
+                    if not remaining[index]:  # every move of lone king loses
+                        values[index] = plies + 2
+                        buckets.setdefault(plies + 1, []).append(index)
+        plies += 1
+    if pool is not None:
+        pool.shutdown()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.bin")
+    with open(path, "wb") as file:
+        file.write(values)
+    return path, won, longest
+
+
+class Tablebase:
+    def __init__(self, directory=TABLE_DIR):
+        """
+        every generated table in directory is mapped for reading, tables are keyed by piece types of strong side
+        """
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+        for name, types in TABLES.items():
+            path = os.path.join(directory, f"{name}.bin")
+            if not os.path.exists(path):
+                continue
+            table = Table(name)
+            file = open(path, "rb")
+            if os.fstat(file.fileno()).st_size != table.size:
+                file.close()
+                raise ValueError(f"{path} isn't table of {name}")
+            self.files.append(file)
+            self.tables[(KING,) + types] = table, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def value(self, types, side, white_king, black_king, pieces):
+        """Value stored for position, 0 for draw, else plies to mate + 1
+        :param types: piece types of strong side, king first
+        :param side: 0 when strong side is on move
+        :param white_king:
+        :param black_king:
+        :param pieces:
+        :return None when there isn't table:
+        """
+        if types not in self.tables:
+            return None
+        table, data = self.tables[types]
+        return data[table.index(side, white_king, black_king, pieces)]
+
+    def probe(self, board, color):
+        """Result of position on board
+        :param board:
+        :param color: color on move
+        :return (WIN, LOSS or DRAW, plies to mate) or None when position isn't in tables:
+        """
+        on_board = board.pieces()
+        if len(on_board) > MAX_PIECES:
+            return None
+        sides = ([], [])
+        for piece in on_board:
+            sides[piece.color].append(piece)
+        strong = Color.WHITE if len(sides[Color.WHITE]) >= len(sides[Color.BLACK]) else Color.BLACK
+        if len(sides[strong ^ 1]) != 1:
+            return None
+        pieces = sorted(sides[strong], key=lambda piece: piece.piece_type, reverse=True)  # king first, like in TABLES
+        types = tuple(piece.piece_type for piece in pieces)
+        if types == (KING,) or types in ((KING, BISHOP), (KING, KNIGHT)):
+            return DRAW, 0  # mate isn't possible
+        if types not in self.tables or castling_key(board.board):
+            return None
+        table, data = self.tables[types]
+        flip = 0 if strong == Color.WHITE else SQUARES - COLS  # black strong side is turned to white
+        value = data[table.index(0 if color == strong else 1, pieces[0].square ^ flip,
+                                 sides[strong ^ 1][0].square ^ flip, [piece.square ^ flip for piece in pieces[1:]])]
+        if not value:
+            return DRAW, 0
+        return (WIN if color == strong else LOSS), value - 1
+
+    def best_move(self, board, color):
+        """Move which wins fastest, loses slowest or keeps draw
+        :param board:
+        :param color: color on move
+        :return (piece, square, promotion), (result, plies to mate) or None when position isn't in tables:
+        """
+        if self.probe(board, color) is None:
+            return None
+        best, best_key = None, None
+        for move in board.generate_legal_moves(color):
+            board.move(*move)
+            probed = self.probe(board, color ^ 1)
+            board.unmake_move()
+            if probed is None:
+                continue
+            result, plies = -probed[0], probed[1] + 1
+            key = (result, -plies if result == WIN else plies)  # win fast, lose slowly
+            if best_key is None or key > best_key:
+                best, best_key = (move, (result, plies)), key
+        return best
+
+    def close(self):
+        for _, data in self.tables.values():
+            data.close()
+        for file in self.files:
+            file.close()
+        self.tables = {}
+        self.files = []
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.tablebase", description=__doc__)
+    parser.add_argument("tables", nargs="*", default=list(TABLES), choices=list(TABLES) + [[]], metavar="TABLE",
+                        help=f"tables to generate, {', '.join(TABLES)} by default")
+    parser.add_argument("--workers", type=int, help="number of processes, every core by default")
+    parser.add_argument("--directory", default=TABLE_DIR)
+    args = parser.parse_args()
+    for name in args.tables:
+        start = time.perf_counter()
+        path, won, longest = generate(name, args.directory, args.workers)
+        print(f"{name:5} {won:>9} won positions  longest mate {longest:>3} plies  "
+              f"{os.path.getsize(path):>9} bytes  {time.perf_counter() - start:8.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+from chess.constants import ROWS, COLS, SQUARES
+
+KNIGHT_STEPS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+ROOK_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+PAWN_DIRECTION = (-1, 1)  # indexed by color, white pawns go to row 0, black to row 7
+
+
+def _on_board(row, col):
+    return 0 <= row < ROWS and 0 <= col < COLS
+
+
+def _steps(row, col, steps):
+    """Squares reachable from (row, col) with one of steps
+    :param row:
+    :param col:
+    :param steps:
+    :return tuple of squares:
+    """
+    return tuple((row + r) * COLS + col + c for r, c in steps if _on_board(row + r, col + c))
+
+
+def _ray(row, col, direction):
+    """Squares from (row, col) excluded to edge of board, in order of distance
+    :param row:
+    :param col:
+    :param direction:
+    :return tuple of squares:
+    """
+    r_step, c_step = direction
+    ray = []
+    row, col = row + r_step, col + c_step
+    while _on_board(row, col):
+        ray.append(row * COLS + col)
+        row, col = row + r_step, col + c_step
+    return tuple(ray)
+
+
+def _table(func, *args):
+    """Build table of func results indexed by square
+    :param func: called with row and col of square
+    :param args: other arguments of func
+    :return:
+    """
+    return tuple(func(square // COLS, square % COLS, *args) for square in range(SQUARES))
+
+
+# every table is indexed by square and built once at import time
+KNIGHT_TARGETS = _table(_steps, KNIGHT_STEPS)
+KING_TARGETS = _table(_steps, KING_STEPS)
+PAWN_ATTACKS = tuple(_table(_steps, [(step, -1), (step, 1)]) for step in PAWN_DIRECTION)  # indexed by color first
+PAWN_PUSHES = tuple(_table(_steps, [(step, 0), (2 * step, 0)]) for step in PAWN_DIRECTION)
+RAYS = {direction: _table(_ray, direction) for direction in BISHOP_DIRECTIONS + ROOK_DIRECTIONS}
+BISHOP_RAYS = tuple(tuple(RAYS[direction][square] for direction in BISHOP_DIRECTIONS) for square in range(SQUARES))
+ROOK_RAYS = tuple(tuple(RAYS[direction][square] for direction in ROOK_DIRECTIONS) for square in range(SQUARES))
+QUEEN_RAYS = tuple(BISHOP_RAYS[square] + ROOK_RAYS[square] for square in range(SQUARES))
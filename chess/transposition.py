@@ -0,0 +1,60 @@
+EXACT, LOWER, UPPER = 0, 1, 2  # score is exact, at least score (beta cutoff), at most score (no move raised alpha)
+
+
+class TranspositionTable:
+    def __init__(self, size=1 << 18):
+        """
+        entries are (key, depth, score, flag, move, age) or None, slot of key is key & mask,
+        size is rounded down to power of 2, table never grows
+        age is number of search, which stored entry, entries of older searches are replaced first
+        """
+        size = 1 << max(size, 1).bit_length() - 1
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.age = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """Make every stored entry older, called before every search
+        """
+        self.age += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.age = 0
+
+    def probe(self, key):
+        """Get entry of position
+        :param key: zobrist key of position
+        :return (key, depth, score, flag, move, age) or None:
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move=None):
+        """Store result of search, entry in slot is replaced when it is the same position,
+        it comes from older search or it was searched less deep
+        :param key:
+        :param depth:
+        :param score:
+        :param flag: EXACT, LOWER or UPPER
+        :param move: best move found, it is searched first next time
+        """
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[5] != self.age or depth >= entry[1]:
+            if move is None and entry is not None and entry[0] == key:
+                move = entry[4]  # keep best move of position, if this search didn't find any
+            self.entries[index] = (key, depth, score, flag, move, self.age)
+            self.stores += 1
+
+    def usage(self):
+        """Part of slots used by current search, in per mille like UCI hashfull
+        :return:
+        """
+        sample = self.entries[:1000]
+        return sum(1 for entry in sample if entry is not None and entry[5] == self.age) * 1000 // len(sample)
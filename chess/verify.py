@@ -0,0 +1,359 @@
+"""Consistency checks of rules core, random games with fixed seed are played and results of different code paths
+are compared, run them with python -m chess.verify from directory of game, every check is run when none is named.
+Check of game records plays through Game, so it needs pygame, window isn't shown
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from chess.bitboard import BitboardBoard, squares
+from chess.board import Board, CHECKMATE, STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVES, REPETITION, \
+    FIFTY_MOVE_PLIES
+from chess.constants import WIDTH, HEIGHT, COLS, PROMOTION_TYPES, PAWN, KNIGHT, BISHOP, KING
+from chess.fen import castling_rights, dump_placement, dump_position, load_position
+from chess.perft import BOARD_CLASSES
+from chess.pgn import parse_san
+from chess.piece import Piece
+
+TERMINATIONS = (  # FEN, moves in SAN and verdict after them
+    ("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1", "", CHECKMATE),
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", "", STALEMATE),
+    ("k7/8/1Q6/8/8/8/8/K7 w - - 0 1", "Kb2", STALEMATE),
+    ("8/8/4k3/8/8/3K4/8/8 w - - 0 1", "", INSUFFICIENT_MATERIAL),
+    ("8/8/4k3/8/8/3K4/8/2B5 w - - 0 1", "", INSUFFICIENT_MATERIAL),
+    ("5b2/8/4k3/8/8/3K4/8/2B5 w - - 0 1", "", INSUFFICIENT_MATERIAL),  # bishops on squares of one color
+    ("2b5/8/4k3/8/8/3K4/8/2B5 w - - 0 1", "", None),
+    ("8/8/4k3/8/8/3K4/8/1N4N1 w - - 0 1", "", None),  # two knights can't force mate, but mate is possible
+    ("4k3/8/8/8/8/1N6/8/r3K3 w - - 0 1", "Nxa1", INSUFFICIENT_MATERIAL),
+    ("6k1/8/6K1/8/8/8/8/R7 w - - 99 80", "", None),
+    ("6k1/8/6K1/8/8/8/8/R7 w - - 99 80", "Kf6", FIFTY_MOVES),
+    ("6k1/8/6K1/8/8/8/8/R7 w - - 99 80", "Ra8#", CHECKMATE),  # mate on 100th ply wins
+    ("6k1/8/6K1/8/8/8/P7/R7 w - - 99 80", "a3", None),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", "Nf3 Nf6 Ng1 Ng8 Nf3 Nf6 Ng1", None),
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", "Nf3 Nf6 Ng1 Ng8 Nf3 Nf6 Ng1 Ng8", REPETITION),
+    ("r3k3/8/8/8/8/8/8/4K2R w Kq - 0 1", "Kf1 Kd8 Ke1 Ke8 Kf1 Kd8 Ke1 Ke8", None),  # castling rights were lost
+    ("r3k3/8/8/8/8/8/8/4K2R w Kq - 0 1", "Kf1 Kd8 Ke1 Ke8 Kf1 Kd8 Ke1 Ke8 Kf1 Kd8 Ke1 Ke8", REPETITION),
+)
+RECORD_FENS = (None, "4k3/P7/8/8/8/8/8/4K3 w - - 3 40", "4k3/8/8/8/8/8/p7/4K3 b - - 0 1",
+               "P6k/8/8/8/8/8/8/K7 b - - 0 1")  # None is normal start, pawns on last row wait for promotion
+
+
+def _choice(rng, moves):
+    """Random move, moves are sorted first because their order depends on order of pieces in sets
+    :param rng:
+    :param moves: list of (piece, square, promotion)
+    :return:
+    """
+    return rng.choice(sorted(moves, key=lambda move: (move[0].square, move[1], move[2])))
+
+
+def _random_game(rng, board_class, plies=200):
+    """Random game with takebacks, every position is yielded before move is chosen, pawn is promoted to random piece,
+    some pawns wait for promote() like in Game
+    :param rng:
+    :param board_class:
+    :param plies:
+    :return generator of (board, color):
+    """
+    board, color = board_class(), 0
+    for _ in range(plies):
+        yield board, color
+        moves = board.generate_legal_moves(color)
+        if not moves:
+            return
+        piece, square, promotion = _choice(rng, moves)
+        if promotion and rng.random() < 0.5:
+            board.move(piece, square)
+            board.promote(piece, rng.choice(PROMOTION_TYPES))
+        else:
+            board.move(piece, square, promotion)
+        color ^= 1
+        if rng.random() < 0.1:
+            board.unmake_move()
+            color ^= 1
+
+
+def _status(board):
+    """Incremental state of list board, pieces are named by color, type and square, so boards can be compared
+    :param board:
+    :return:
+    """
+    def name(piece):
+        return piece.color, piece.piece_type, piece.square
+
+    pieces = {name(piece): (sorted(moves), sorted(defended), sorted(attacked), sorted(watched))
+              for piece, (moves, defended, attacked, watched) in board.piece_status.items()}
+    watchers = [sorted(name(piece) for piece in watching) for watching in board.watchers]
+    kings = {color: name(king) for color, king in board.king_pieces.items()}
+    return pieces, board.attacks, watchers, kings
+
+
+def _recomputed(board):
+    """Copy of board with status generated from scratch
+    :param board:
+    :return:
+    """
+    pieces = []
+    for piece in board.pieces():
+        copy = Piece(piece.square, piece.color, piece.piece_type)
+        copy.moves = piece.moves
+        pieces.append(copy)
+    fresh = Board()
+    fresh.set_pieces(pieces)
+    return fresh
+
+
+def check_status(games, seed):
+    """Compare moves, attack counters and watchers, which Board updates incrementally after every move, takeback
+    and promotion, with status computed from scratch
+    :param games:
+    :param seed:
+    :return True if every position is the same, summary:
+    """
+    rng = random.Random(seed)
+    positions = 0
+    for number in range(games):
+        for board, _ in _random_game(rng, Board):
+            positions += 1
+            if _status(board) != _status(_recomputed(board)):
+                print(f"game {number}  status differs after {[(undo[1], undo[0].square) for undo in board.undo_stack]}")
+                return False, f"{positions} positions"
+    return True, f"{positions} positions"
+
+
+def _moves(board, color, captures_only=False):
+    return {(piece.square, square, promotion or 0)
+            for piece, square, promotion in board.generate_legal_moves(color, captures_only)}
+
+
+def _pins(board, color):
+    """Pinned pieces with squares they can go to, and squares of checking pieces, from list board
+    :param board:
+    :param color:
+    :return:
+    """
+    pins, checks = board.pins_and_checks(color)
+    return {piece.square: set(ray) for piece, ray in pins.items()}, sorted(piece.square for piece, _ in checks)
+
+
+def _bitboard_pins(board, color):
+    """Pins and checking pieces like _pins, from bitboards
+    :param board:
+    :param color:
+    :return:
+    """
+    pins = {square: set(squares(ray)) for square, ray in board.position.pins(color).items()}
+    return pins, list(squares(board.position.checkers(color)))
+
+
+def check_legal(games, seed):
+    """Play the same random games on Board and BitboardBoard and compare legal moves, captures, pins, checks,
+    check and hash in every position, list board finds pins by rays from king, bitboard by masks
+    :param games:
+    :param seed:
+    :return True if every position is the same, summary:
+    """
+    rng = random.Random(seed)
+    positions = 0
+    for number in range(games):
+        boards, color = (Board(), BitboardBoard()), 0
+        for ply in range(200):
+            positions += 1
+            board, bitboard = boards
+            moves = _moves(board, color)
+            if moves != _moves(bitboard, color) or _moves(board, color, True) != _moves(bitboard, color, True) or \
+                    _pins(board, color) != _bitboard_pins(bitboard, color) or \
+                    board.in_check(color) != bitboard.in_check(color) or board.hash != bitboard.hash:
+                print(f"game {number}  ply {ply}  boards differ in {dump_position(board, color)}")
+                return False, f"{positions} positions"
+            if not moves:
+                break
+            start, square, promotion = rng.choice(sorted(moves))
+            for board in boards:
+                board.move(board.board[start], square, promotion or None)
+            color ^= 1
+            if rng.random() < 0.1:
+                for board in boards:
+                    board.unmake_move()
+                color ^= 1
+    return True, f"{positions} positions"
+
+
+def _expected_termination(board, color, keys, clock):
+    """Verdict computed without incremental state of board, moves come from copy generated from scratch,
+    repetitions are counted in keys of positions and halfmove clock is kept by caller
+    :param board:
+    :param color: color on move
+    :param keys: (placement, color, castling) of every position of game, current one included
+    :param clock: plies since last capture or pawn move
+    :return:
+    """
+    fresh = _recomputed(board)
+    if not fresh.generate_legal_moves(color):
+        return CHECKMATE if fresh.in_check(color) else STALEMATE
+    others = [piece for piece in board.pieces() if piece.piece_type != KING]
+    if all(piece.piece_type in (KNIGHT, BISHOP) for piece in others) and \
+            (len(others) <= 1 or all(piece.piece_type == BISHOP for piece in others) and
+             len({(piece.row + piece.col) % 2 for piece in others}) == 1):
+        return INSUFFICIENT_MATERIAL
+    if clock >= FIFTY_MOVE_PLIES:
+        return FIFTY_MOVES
+    if keys.count(keys[-1]) >= 3:
+        return REPETITION
+    return None
+
+
+def _key(board, color):
+    return dump_placement(board), color, castling_rights(board)
+
+
+def check_termination(games, seed):
+    """Compare Board.termination with verdicts of hand written positions, then play random games on both boards
+    and compare every verdict with one computed from scratch
+    :param games:
+    :param seed:
+    :return True if every verdict is right, summary:
+    """
+    ok = True
+    for board_class in BOARD_CLASSES.values():
+        for fen, moves, expected in TERMINATIONS:
+            board, color = load_position(fen, board_class)
+            for san in moves.split():
+                board.move(*parse_san(board, color, san))
+                color ^= 1
+            verdict = board.termination(color)
+            if verdict != expected:
+                print(f"{board_class.__name__}  {fen}  {moves}  {verdict}, expected {expected}")
+                ok = False
+
+    rng = random.Random(seed)
+    verdicts = {}
+    for number in range(games):
+        board_class = list(BOARD_CLASSES.values())[number % len(BOARD_CLASSES)]
+        board, color = board_class(), 0
+        keys, clocks = [_key(board, color)], [0]
+        for ply in range(400):
+            expected = _expected_termination(board, color, keys, clocks[-1])
+            verdict = board.termination(color)
+            board.checkmate_bool = board.draw_bool = False
+            verdicts[verdict] = verdicts.get(verdict, 0) + 1
+            if verdict != expected:
+                print(f"game {number}  ply {ply}  {dump_position(board, color)}  {verdict}, expected {expected}")
+                return False, f"{sum(verdicts.values())} positions"
+            if verdict:
+                break
+            piece, square, promotion = _choice(rng, board.generate_legal_moves(color))
+            reset = piece.piece_type == PAWN or board.board[square] != 0
+            board.move(piece, square, promotion)
+            color ^= 1
+            keys.append(_key(board, color))
+            clocks.append(0 if reset else clocks[-1] + 1)
+            if rng.random() < 0.05:
+                board.unmake_move()
+                color ^= 1
+                keys.pop()
+                clocks.pop()
+    ended = sum(count for verdict, count in verdicts.items() if verdict)
+    return ok, f"{len(TERMINATIONS)} positions, {sum(verdicts.values())} played, {ended} ended"
+
+
+def _click(game, square):
+    game.select(*divmod(square, COLS))
+
+
+def check_record(games, seed):
+    """Play random games through Game with takebacks, promotions and FEN starts, write them to log
+    and compare positions rebuilt from log with Game.fen(), reset must return to starting position of game
+    :param games:
+    :param seed:
+    :return True if every game is the same, summary:
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from chess.assets import atlas
+    from chess.game import Game
+    from chess.overlay import overlays
+    from chess.record import GameArchive, GameLog
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    atlas.resize(WIDTH // COLS)
+    overlays.load()
+    rng = random.Random(seed)
+    expected, ok = [], True
+    with tempfile.TemporaryDirectory() as directory:
+        log = GameLog(directory)
+        game = Game(win, log=log)
+        start = game.fen()
+        for number in range(games):
+            fen = RECORD_FENS[number % len(RECORD_FENS)]
+            if fen:  # otherwise game restarts from start of previous one
+                game.load_fen(fen)
+                start = game.fen()
+            for _ in range(rng.randrange(120)):
+                if game.board.checkmate_bool or game.board.draw_bool:
+                    break
+                if game.pawn_promotion:
+                    _click(game, rng.choice(sorted(game.to_promote[1])))
+                    continue
+                action = rng.random()
+                if action < 0.08:
+                    game.undo()
+                elif action < 0.12:
+                    game.redo()
+                else:
+                    piece, square, _ = _choice(rng, game.board.generate_legal_moves(game.turn))
+                    _click(game, piece.square)
+                    _click(game, square)
+            if game.pawn_promotion:
+                _click(game, rng.choice(sorted(game.to_promote[1])))
+            if game.board.undo_stack:  # game without moves isn't written
+                expected.append((game.fen(), game.result()))
+            game.reset()
+            if game.fen() != start:
+                print(f"game {number}  reset to {game.fen()}, expected {start}")
+                ok = False
+        log.close()
+        archive = GameArchive(log.path)
+        ok = ok and len(archive) == len(expected)
+        for number, (fen, result) in enumerate(expected[:len(archive)]):
+            board, color = archive.position(number)
+            if dump_position(board, color) != fen or archive.headers(number)["result"] != result:
+                print(f"game {number}  log {dump_position(board, color)} {archive.headers(number)['result']}  "
+                      f"game {fen} {result}")
+                ok = False
+        archive.close()
+    pygame.quit()
+    return ok, f"{len(expected)} games"
+
+
+CHECKS = {
+    "status": check_status,
+    "legal": check_legal,
+    "termination": check_termination,
+    "record": check_record,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m chess.verify", description=__doc__)
+    parser.add_argument("checks", nargs="*", help=f"checks to run, all by default: {', '.join(CHECKS)}")
+    parser.add_argument("--games", type=int, default=40, help="random games of every check")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown checks {', '.join(unknown)}")
+    failed = False
+    for name in args.checks or CHECKS:
+        start = time.perf_counter()
+        ok, summary = CHECKS[name](args.games, args.seed)
+        print(f"{name:12} {summary:40} {time.perf_counter() - start:7.1f} s  {'ok' if ok else 'FAIL'}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,20 @@
-from datetime import datetime, timedelta
+import argparse
+import os
 import pygame
 import pygame_menu
-from chess.constants import WIDTH, HEIGHT, SQUARE_SIZE
-from chess.game import Game
-
-FPS = 60
-clock = None
+from chess.assets import atlas
+from chess.constants import WIDTH, HEIGHT, SQUARE_SIZE, Color
+from chess.analysis import EngineService
+from chess.bitboard import BitboardBoard
+from chess.board import Board
+from chess.book import OpeningBook
+from chess.fen import load_position
+from chess.parallel import ParallelEngine
+from chess.record import GameLog, LOG_DIR
+from chess.tablebase import Tablebase, TABLE_DIR
+from chess.game import Game, CHECK_EXPIRED
+from chess.overlay import overlays
+from chess.profiling import profiler, ENV_VAR
 
 
 def get_row_col_from_mouse(pos):
@@ -19,44 +28,85 @@ def get_row_col_from_mouse(pos):
     return row, col
 
 
-def gameloop(win):
-    """Game runs here
-    :param win:
+FRAME_TIME = 16  # ms between frames, while engine thinks
+BOOK_PATH = "assets/book.bin"  # opening book in polyglot format, build it with python -m chess.book
+
+
+def wait_events(timeout=0):
+    """Sleep until user does something or timer fires, then take all waiting events
+    :param timeout: max time of sleep in ms, 0 sleeps until next event
+    :return events:
     """
-    global clock
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
 
+def gameloop(win, settings=None):
+    """Game runs here, loop sleeps when nothing happens, and window is redrawn only after state changed
+    :param win:
+    :param settings: choices from menu, color of computer (None for 2 players), its strength and worker processes,
+    rules core, FEN of starting position
+    """
     run = True
-    clock = pygame.time.Clock()
-    game = Game(win)
+    settings = settings or {}
+    board_class = settings.get("board_class", Board)
+    book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+    engine = None
+    tablebase = None
+    if settings.get("engine_color") is not None:
+        tablebase = Tablebase(TABLE_DIR)  # tables, which weren't generated, are skipped
+        engine = EngineService(ParallelEngine(settings.get("workers", 1), book=book, tablebase=tablebase,
+                                              board_class=board_class, **settings.get("strength", {})), board_class)
+    log = GameLog(LOG_DIR)  # every game of session is recorded
+    game = Game(win, board_class, engine=engine, engine_color=settings.get("engine_color"), book=book, log=log)
+    if settings.get("fen"):
+        game.load_fen(settings["fen"])
+    game.update()
 
     while run:
-        clock.tick(FPS)  # max 60fps in game
-
-        for event in pygame.event.get():  # loop checks if user did something
+        game.think()  # starts search or makes move of engine, search runs in background
+        events = wait_events(FRAME_TIME if game.thinking or profiler.enabled else 0)  # stats are shown every frame
+        profiler.start_frame()
+        for event in events:  # loop checks if user did something
             if event.type == pygame.QUIT:
                 run = False
+            if event.type == CHECK_EXPIRED:
+                game.hide_check()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     game.reset()
+                if event.key == pygame.K_LEFT:
+                    game.undo()
+                if event.key == pygame.K_RIGHT:
+                    game.redo()
+                if event.key == pygame.K_F3:
+                    profiler.toggle()
             if event.type == pygame.MOUSEBUTTONDOWN:  # on mouse click
-                pos = pygame.mouse.get_pos()
-                row, col = get_row_col_from_mouse(pos)
+                row, col = get_row_col_from_mouse(event.pos)
                 game.select(row, col)
 
-        if not game.display_check:
-            start_time = datetime.now()
-        else:
-            if datetime.now() - start_time > timedelta(seconds=1.5):
-                game.display_check = False
-
-        game.update()  # updates screen
-
+        game.update()  # redraws only changed squares
+        profiler.end_frame(game, len(events))
+
+    log.end(game.result())
+    log.close()
+    if profiler.timers:  # profiling was on in this session
+        profiler.dump()
+    if engine:
+        engine.close()
+    if book:
+        book.close()
+    if tablebase:
+        tablebase.close()
     pygame.quit()
 
 
-def menu(win):
+def menu(win, fen=None):
     """Create menu with pygame_menu package
     :param win:
+    :param fen: starting position of every game, None for normal start
     """
     my_theme = pygame_menu.themes.THEME_DARK.copy()
     my_theme.title_bar_style = pygame_menu.widgets.MENUBAR_STYLE_NONE
@@ -69,8 +119,21 @@ def menu(win):
 
     my_menu = pygame_menu.Menu("pygame_chess", 800, 800, theme=my_theme)
     my_menu.add.image(image_path="assets/chess_menu.png", image_id="chess_menu", scale=(0.65, 0.65),
-                      padding=(0, 0, 100, 0))
-    my_menu.add.button("play", gameloop, win)
+                      padding=(0, 0, 40, 0))
+    settings = {"engine_color": None, "strength": {"depth": 3}, "workers": 1, "board_class": Board, "fen": fen}
+    selector_style = {"style": pygame_menu.widgets.SELECTOR_STYLE_FANCY,
+                      "style_fancy_bgcolor": my_theme.background_color,
+                      "style_fancy_bordercolor": my_theme.widget_font_color}
+    my_menu.add.selector("computer ", [("off", None), ("black", Color.BLACK), ("white", Color.WHITE)],
+                         onchange=lambda _, value: settings.update(engine_color=value), **selector_style)
+    my_menu.add.selector("level ", [("depth 2", {"depth": 2}), ("depth 3", {"depth": 3}), ("depth 4", {"depth": 4}),
+                                    ("1 sec", {"movetime": 1000}), ("3 sec", {"movetime": 3000})],
+                         default=1, onchange=lambda _, value: settings.update(strength=value), **selector_style)
+    my_menu.add.selector("cores ", [("1", 1), ("2", 2), ("4", 4), ("all", None)],
+                         onchange=lambda _, value: settings.update(workers=value), **selector_style)
+    my_menu.add.selector("rules ", [("list", Board), ("bitboard", BitboardBoard)],
+                         onchange=lambda _, value: settings.update(board_class=value), **selector_style)
+    my_menu.add.button("play", gameloop, win, settings)
     my_menu.add.button("exit", pygame_menu.events.EXIT)
     my_menu.mainloop(win)
 
@@ -79,10 +142,22 @@ def main():
     """pygame inits itself and then creates window and title of window,
     window parameter is passed to other functions, and used throughout the game
     """
+    parser = argparse.ArgumentParser(prog="python main.py")
+    parser.add_argument("--fen", help="start games from this position")
+    args = parser.parse_args()
+    if args.fen:
+        try:
+            load_position(args.fen)  # broken FEN is reported before window opens
+        except ValueError as error:
+            parser.error(str(error))
+    if os.environ.get(ENV_VAR):
+        profiler.enable()  # before assets are loaded, so their loading is timed too
     pygame.init()
     win = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("pygame_chess")
-    menu(win)
+    atlas.resize(SQUARE_SIZE)  # decode and scale all images once, after display mode is set
+    overlays.load()  # render texts and promotion pieces once
+    menu(win, args.fen)
 
 
 if __name__ == '__main__':